@@ -8,6 +8,19 @@ import { StatusBar } from 'expo-status-bar';
 const Tab = createBottomTabNavigator();
 const API_URL = "https://shadowstrike-options-2025.onrender.com";
 
+// Last response per URL, revalidated with If-None-Match so unchanged data costs a 304
+const responseCache = new Map();
+
+async function cachedGet(path) {
+  const url = `${API_URL}${path}`;
+  const cached = responseCache.get(url);
+  const response = await fetch(url, cached ? { headers: { 'If-None-Match': cached.etag } } : undefined);
+  if (response.status === 304 && cached) return cached;
+  const entry = { etag: response.headers.get('ETag'), data: await response.json(), headers: response.headers };
+  if (response.ok && entry.etag) responseCache.set(url, entry);
+  return entry;
+}
+
 // Login Screen
 function LoginScreen({ navigation }) {
   const [email, setEmail] = React.useState('');
@@ -186,8 +199,7 @@ function Top10Screen() {
   const fetchTopPicks = async () => {
     setLoading(true);
     try {
-      const response = await fetch(`${API_URL}/api/top10`);
-      const data = await response.json();
+      const { data } = await cachedGet('/api/top10');
       setTopPicks(data);
     } catch {
       Alert.alert('Error', 'Failed to fetch top picks');
@@ -210,6 +222,7 @@ function Top10Screen() {
           type: pick.type,
           strike: pick.strike || pick.buy_strike,
           price: pick.price,
+          expiration: pick.expiration,
           contracts: parseInt(contracts),
           stop_loss: analysis[0]?.details?.StopLoss || (pick.strike || pick.buy_strike) * 0.9,
           target_price: (pick.strike || pick.buy_strike) * 1.1
@@ -263,8 +276,7 @@ function ScannerScreen() {
   const runOptionsScanner = async () => {
     setScanning(true);
     try {
-      const response = await fetch(`${API_URL}/api/scanner`);
-      const data = await response.json();
+      const { data } = await cachedGet('/api/scanner');
       setOptionsData(data);
       const message = data.map(item => `${item.symbol} ${item.type} ${item.strike ? '$' + item.strike : ''} - ${item.probabilityITM}%`).join('\n');
       Alert.alert('🎯 High-Probability Options', `Results:\n\n${message}`);
@@ -302,6 +314,7 @@ function ScannerScreen() {
           type: option.type,
           strike: option.strike || option.buy_strike,
           price: option.price,
+          expiration: option.expiration,
           contracts: parseInt(contracts),
           stop_loss: option.strike ? option.strike * 0.9 : option.breakeven * 0.9,
           target_price: option.strike ? option.strike * 1.1 : option.breakeven * 1.1
@@ -386,14 +399,15 @@ function ScannerScreen() {
 // Trades Screen
 function TradesScreen() {
   const [portfolio, setPortfolio] = React.useState([]);
+  const [nextCursor, setNextCursor] = React.useState(null);
   const [loading, setLoading] = React.useState(false);
 
-  const fetchPortfolio = async () => {
+  const fetchPortfolio = async (cursor = null) => {
     setLoading(true);
     try {
-      const response = await fetch(`${API_URL}/api/portfolio`);
-      const data = await response.json();
-      setPortfolio(data);
+      const { data, headers } = await cachedGet(`/api/portfolio${cursor ? `?cursor=${cursor}` : ''}`);
+      setPortfolio(cursor ? [...portfolio, ...data] : data);
+      setNextCursor(headers.get('X-Next-Cursor'));
     } catch {
       Alert.alert('Error', 'Failed to fetch portfolio');
     }
@@ -421,7 +435,12 @@ function TradesScreen() {
             <Text style={styles.detailText}>Target: ${trade.target_price.toFixed(2)}</Text>
           </View>
         ))}
-        <TouchableOpacity style={styles.button} onPress={fetchPortfolio} disabled={loading}>
+        {nextCursor && (
+          <TouchableOpacity style={styles.button} onPress={() => fetchPortfolio(nextCursor)} disabled={loading}>
+            <Text style={styles.buttonText}>{loading ? 'Loading...' : 'Load More Trades'}</Text>
+          </TouchableOpacity>
+        )}
+        <TouchableOpacity style={styles.button} onPress={() => fetchPortfolio()} disabled={loading}>
           <Text style={styles.buttonText}>{loading ? 'Loading...' : 'Refresh Portfolio'}</Text>
         </TouchableOpacity>
       </View>
@@ -429,54 +448,90 @@ function TradesScreen() {
   );
 }
 
+// Reads the /api/stream Server-Sent Events over XMLHttpRequest, since React Native has no EventSource.
+// Calls onEvent('snapshot' | 'delta', data) and reconnects until the returned function is called.
+const MAX_STREAM_BUFFER = 1000000;
+function openMarketStream(symbols, onEvent, onError) {
+  let xhr;
+  let seen = 0;
+  let closed = false;
+  let retryTimer;
+  const connect = () => {
+    seen = 0;
+    xhr = new XMLHttpRequest();
+    xhr.open('GET', `${API_URL}/api/stream?symbols=${symbols.join(',')}`);
+    xhr.onprogress = () => {
+      const text = xhr.responseText;
+      let end;
+      while ((end = text.indexOf('\n\n', seen)) !== -1) {
+        let event = 'message';
+        let data = '';
+        text.slice(seen, end).split('\n').forEach((line) => {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        });
+        seen = end + 2;
+        if (data) onEvent(event, JSON.parse(data));
+      }
+      // responseText keeps growing on a long-lived request, so start a fresh one now and then
+      if (seen > MAX_STREAM_BUFFER) xhr.abort();
+    };
+    xhr.onloadend = () => {
+      if (closed) return;
+      if (seen <= MAX_STREAM_BUFFER && onError) onError();
+      retryTimer = setTimeout(connect, seen > MAX_STREAM_BUFFER ? 0 : 5000);
+    };
+    xhr.send();
+  };
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    xhr.abort();
+  };
+}
+
+const WATCHLIST = ['SPY', 'QQQ', 'AAPL', 'MSFT', 'TSLA', 'GOOGL', 'AMZN', 'NVDA', 'META', 'NFLX'];
+
 // Market Screen
 function MarketScreen() {
-  const [stockData, setStockData] = React.useState([]);
-  const [loading, setLoading] = React.useState(false);
+  const [symbols, setSymbols] = React.useState(WATCHLIST);
+  const [quotes, setQuotes] = React.useState({});
+  const [marketStatus, setMarketStatus] = React.useState(null);
+  const [connected, setConnected] = React.useState(false);
   const [lastUpdate, setLastUpdate] = React.useState('');
   const [searchSymbol, setSearchSymbol] = React.useState('');
   const [showSearch, setShowSearch] = React.useState(false);
 
-  const fetchMarketData = async (symbols) => {
-    setLoading(true);
-    try {
-      const response = await fetch(`${API_URL}/market-data`);
-      const data = await response.json();
-      setStockData(data.top_movers);
+  React.useEffect(() => {
+    const close = openMarketStream(symbols, (event, data) => {
+      setConnected(true);
+      if (data.status) setMarketStatus(data.status);
+      setQuotes((current) => {
+        const next = event === 'snapshot' ? {} : { ...current };
+        Object.assign(next, data.quotes);
+        (data.removed || []).forEach((symbol) => delete next[symbol]);
+        return next;
+      });
       setLastUpdate(new Date().toLocaleTimeString());
-    } catch {
-      Alert.alert('Error', 'Failed to fetch market data');
-    }
-    setLoading(false);
-  };
+    }, () => setConnected(false));
+    return close;
+  }, [symbols]);
 
-  React.useEffect(() => {
-    fetchMarketData(['SPY', 'QQQ', 'AAPL', 'MSFT', 'TSLA', 'GOOGL', 'AMZN', 'NVDA', 'META', 'NFLX']);
-    const interval = setInterval(() => fetchMarketData(['SPY', 'QQQ', 'AAPL', 'MSFT', 'TSLA', 'GOOGL', 'AMZN', 'NVDA', 'META', 'NFLX']), 30000);
-    return () => clearInterval(interval);
-  }, []);
+  const stockData = symbols.map((symbol) => quotes[symbol]).filter(Boolean);
 
-  const searchStock = async () => {
+  const searchStock = () => {
     if (!searchSymbol.trim()) {
       Alert.alert('Enter Symbol', 'Please enter a stock symbol');
       return;
     }
-    await fetchMarketData([searchSymbol.toUpperCase()]);
+    const symbol = searchSymbol.trim().toUpperCase();
+    setSymbols([symbol, ...symbols.filter((s) => s !== symbol)]);
     setSearchSymbol('');
     setShowSearch(false);
   };
 
-  const getMarketStatus = () => {
-    const now = new Date();
-    const hour = now.getHours();
-    const day = now.getDay();
-    const minute = now.getMinutes();
-    const isWeekday = day >= 1 && day <= 5;
-    const currentMinutes = hour * 60 + minute;
-    const marketOpen = 9 * 60 + 30;
-    const marketClose = 16 * 60;
-    return isWeekday && currentMinutes >= marketOpen && currentMinutes < marketClose ? 'OPEN' : 'CLOSED';
-  };
+  const getMarketStatus = () => (marketStatus ? marketStatus.status : 'CLOSED');
 
   return (
     <ScrollView style={styles.scrollContainer}>
@@ -516,7 +571,7 @@ function MarketScreen() {
             onPress={() => {
               Alert.alert(
                 `${stock.symbol} Details`,
-                `Price: $${stock.price.toFixed(2)}\nChange: ${stock.change >= 0 ? '+' : ''}$${stock.change.toFixed(2)} (${stock.change_percent.toFixed(2)}%)\nVolume: ${stock.volume.toLocaleString()}\nMarket Cap: $${(stock.market_cap / 1e9).toFixed(2)}B`
+                `Price: $${stock.price.toFixed(2)}\nChange: ${stock.change >= 0 ? '+' : ''}$${stock.change.toFixed(2)} (${stock.change_percent.toFixed(2)}%)\nVolume: ${stock.volume.toLocaleString()}${stock.market_cap ? `\nMarket Cap: $${(stock.market_cap / 1e9).toFixed(2)}B` : ''}`
               );
             }}
           >
@@ -536,8 +591,8 @@ function MarketScreen() {
             </View>
           </TouchableOpacity>
         ))}
-        <TouchableOpacity style={[styles.button, loading && styles.buttonDisabled]} onPress={() => fetchMarketData(['SPY', 'QQQ', 'AAPL', 'MSFT', 'TSLA', 'GOOGL', 'AMZN', 'NVDA', 'META', 'NFLX'])} disabled={loading}>
-          <Text style={styles.buttonText}>{loading ? 'Loading...' : 'Refresh Data'}</Text>
+        <TouchableOpacity style={[styles.button, connected && styles.buttonDisabled]} onPress={() => setSymbols([...symbols])} disabled={connected}>
+          <Text style={styles.buttonText}>{connected ? 'Live' : 'Reconnect'}</Text>
         </TouchableOpacity>
       </View>
     </ScrollView>
@@ -1,75 +1,85 @@
 
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, g, Response, before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import math
+import time
 import logging
-import yfinance as yf
-from ta.momentum import RSIIndicator
-from ta.trend import MACD, ADXIndicator
-import pandas as pd
-import numpy as np
-from scipy.stats import norm
-from flask_cors import CORS
-from retry import retry
-import firebase_admin
-from firebase_admin import auth, credentials
+import functools
 import threading
-import stripe
+from flask_cors import CORS
+from market_cache import stock_data_cache, options_cache, shared_backend
+from gateway import MarketDataGateway
+from parallel import map_symbols, scan_executor, SCAN_WORKERS, SYMBOL_TIMEOUT
+from scanner import TopK, load_universe, scan_universe
+from snapshots import SnapshotRefresher
+import re
+from scheduler import DailyScheduler, market_status
+from market_stream import MarketStream
+import http_cache
+import metrics
+from sqlalchemy import event, inspect, update, bindparam, text
+from sqlalchemy.orm.attributes import set_committed_value
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-import requests
+# Heavy analytics modules (pandas, scipy, yfinance) and external clients are
+# imported on first use, so importing this module stays cheap for every worker
+def lazy_client(factory):
+    # Build the client on first call, once per process
+    lock = threading.Lock()
+    built = []
+    @functools.wraps(factory)
+    def get():
+        if not built:
+            with lock:
+                if not built:
+                    built.append(factory())
+        return built[0]
+    return get
 # Brevo config
 BREVO_API_KEY = os.environ.get("BREVO_API_KEY")
 BREVO_SENDER = {"name": "ShadowStrike Options", "email": "support@shadowstrike.com"}
 BREVO_SMS_SENDER = "2154843692"
+@lazy_client
+def get_notifier():
+    from notifications import NotificationDispatcher, HttpTransport
+    return NotificationDispatcher(
+        HttpTransport(os.environ.get("BREVO_API_URL", "https://api.brevo.com"), BREVO_API_KEY,
+                      pool_size=int(os.environ.get("NOTIFY_WORKERS", 4))),
+        sender=BREVO_SENDER,
+        sms_sender=BREVO_SMS_SENDER,
+        workers=int(os.environ.get("NOTIFY_WORKERS", 4)),
+        rate=float(os.environ.get("NOTIFY_RATE_PER_SECOND", 10)),
+        batch_size=int(os.environ.get("NOTIFY_BATCH_SIZE", 100))
+    )
 def send_email_async(to_email, subject, content):
-    try:
-        headers = {
-            "api-key": BREVO_API_KEY,
-            "Content-Type": "application/json"
-        }
-        data = {
-            "sender": BREVO_SENDER,
-            "to": [{"email": to_email}],
-            "subject": subject,
-            "htmlContent": content
-        }
-        response = requests.post("https://api.brevo.com/v3/smtp/email", json=data, headers=headers)
-        logger.info(f"Brevo email to {to_email} sent: {response.status_code}")
-    except Exception as e:
-        logger.error(f"Brevo email error: {e}")
+    return get_notifier().send_email(to_email, subject, content)
 def send_sms(to_number, message):
-    try:
-        headers = {
-            "api-key": BREVO_API_KEY,
-            "Content-Type": "application/json"
-        }
-        data = {
-            "sender": BREVO_SMS_SENDER,
-            "recipient": to_number,
-            "content": message,
-            "type": "transactional"
-        }
-        response = requests.post("https://api.brevo.com/v1/transactionalSMS/sms", json=data, headers=headers)
-        logger.info(f"Brevo SMS to {to_number} sent: {response.status_code}")
-    except Exception as e:
-        logger.error(f"Brevo SMS error: {e}")
+    return get_notifier().send_sms(to_number, message)
 # Initialize Flask
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'shadowstrike-secret-2025')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///shadowstrike.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-# Email Configuration (SendGrid)
 # Firebase Configuration
-try:
-    cred = credentials.Certificate("path/to/your/firebase-adminsdk.json")
-    firebase_admin.initialize_app(cred)
-except Exception as e:
-    logger.error(f"Firebase initialization error: {e}")
+@lazy_client
+def get_firebase_auth():
+    import firebase_admin
+    from firebase_admin import auth, credentials
+    try:
+        cred = credentials.Certificate(os.environ.get('FIREBASE_CREDENTIALS', "path/to/your/firebase-adminsdk.json"))
+        firebase_admin.initialize_app(cred)
+    except Exception as e:
+        logger.error(f"Firebase initialization error: {e}")
+    return auth
 # Stripe Configuration
-stripe.api_key = os.environ.get('STRIPE_SECRET_KEY', 'sk_test_demo_key')
+@lazy_client
+def get_stripe():
+    import stripe
+    stripe.api_key = os.environ.get('STRIPE_SECRET_KEY', 'sk_test_demo_key')
+    return stripe
 app.config['STRIPE_PUBLIC_KEY'] = os.environ.get('STRIPE_PUBLIC_KEY', 'pk_test_demo_key')
 # Fix for Render Postgres URL
 if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres://'):
@@ -77,13 +87,75 @@ if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres://'):
 # Initialize extensions
 db = SQLAlchemy(app)
 CORS(app)
+# Instrumentation: see /metrics
+metrics.register_caches([stock_data_cache, options_cache])
+PER_REQUEST_COUNTS = ('chain_fetches', 'chain_downloads')
+# Send "X-Profile: <PROFILE_TOKEN>" to get a cProfile report instead of the response body
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+template_latency = metrics.registry.histogram(
+    'shadowstrike_template_render_seconds', 'Jinja template render time', ('template',))
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.metrics_token = metrics.begin_request()
+    g.profiler = None
+    if PROFILE_TOKEN and request.headers.get('X-Profile') == PROFILE_TOKEN:
+        g.profiler = metrics.start_profile()
+@app.after_request
+def record_request_metrics(response):
+    if 'request_started' not in g:
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.request_latency.observe(time.perf_counter() - g.request_started,
+                                    method=request.method, route=route, status=response.status_code)
+    metrics.end_request(g.metrics_token, route, PER_REQUEST_COUNTS)
+    if g.profiler is not None:
+        report = metrics.profile_report(g.profiler)
+        g.profiler = None
+        return Response(report, status=response.status_code, mimetype='text/plain')
+    if PROFILE_TOKEN and request.headers.get('X-Profile') == PROFILE_TOKEN:
+        response.headers['X-Profile'] = 'busy'
+    return response
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+@template_rendered.connect_via(app)
+def record_template_timer(sender, template, context, **extra):
+    if 'template_started' in g:
+        template_latency.observe(time.perf_counter() - g.pop('template_started'), template=template.name or 'inline')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+def _record_query_timer(conn, cursor, statement, parameters, context, executemany):
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'unknown'
+    metrics.upstream_latency.observe(time.perf_counter() - conn.info['query_started'].pop(),
+                                     service='database', operation=operation)
+with app.app_context():
+    event.listen(db.engine, 'before_cursor_execute', _start_query_timer)
+    event.listen(db.engine, 'after_cursor_execute', _record_query_timer)
 # Models
+class User(db.Model):
+    id = db.Column(db.String(100), primary_key=True)  # Firebase uid
+    username = db.Column(db.String(80), nullable=True)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    color = db.Column(db.String(7), default='#10b981')
+    subscription_status = db.Column(db.String(20), default='trial')
+    trial_end_date = db.Column(db.DateTime, nullable=True)
+    subscription_start_date = db.Column(db.DateTime, nullable=True)
+    subscription_end_date = db.Column(db.DateTime, nullable=True)
+    stripe_customer_id = db.Column(db.String(100), nullable=True)
+    stripe_subscription_id = db.Column(db.String(100), nullable=True)
+    email_alerts_enabled = db.Column(db.Boolean, default=True)
+    def days_left_in_trial(self):
+        if self.trial_end_date is None:
+            return 0
+        return max((self.trial_end_date - datetime.utcnow()).days, 0)
 class Trade(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(100), nullable=False)
     symbol = db.Column(db.String(10), nullable=False)
     option_type = db.Column(db.String(10), nullable=False)
     strike_price = db.Column(db.Float, nullable=False)
+    expiration = db.Column(db.String(10), nullable=True)
     entry_price = db.Column(db.Float, nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     entry_date = db.Column(db.DateTime, default=datetime.utcnow)
@@ -94,6 +166,11 @@ class Trade(db.Model):
     exit_price = db.Column(db.Float, nullable=True)
     exit_date = db.Column(db.DateTime, nullable=True)
     pnl = db.Column(db.Float, nullable=True)
+    __table_args__ = (
+        db.Index('ix_trade_user_status_symbol', 'user_id', 'status', 'symbol'),
+        # Portfolio pages walk a user's trades by id
+        db.Index('ix_trade_user_id', 'user_id', 'id'),
+    )
 class EmailAlert(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(100), nullable=False)
@@ -101,17 +178,28 @@ class EmailAlert(db.Model):
     sent_at = db.Column(db.DateTime, default=datetime.utcnow)
     subject = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=True)
-# Helper Functions
-def send_email_async(to_email, subject, content):
+# Nullable columns added to Trade after release; create_all never alters an existing table
+TRADE_ADDED_COLUMNS = ('expiration',)
+def ensure_trade_indexes():
+    # create_all only builds tables it creates, so add new columns and indexes to existing databases too
     try:
-                    from_email="support@shadowstrike.com",
-            to_emails=to_email,
-            subject=subject,
-            html_content=content
-        )
-        response =         logger.info(f"Email sent to {to_email}: {response.status_code}")
+        with app.app_context():
+            inspector = inspect(db.engine)
+            if not inspector.has_table(Trade.__tablename__):
+                return
+            existing = {column['name'] for column in inspector.get_columns(Trade.__tablename__)}
+            for name in TRADE_ADDED_COLUMNS:
+                if name not in existing:
+                    column = Trade.__table__.c[name]
+                    with db.engine.begin() as conn:
+                        conn.execute(text(f'ALTER TABLE {Trade.__tablename__} ADD COLUMN {name} '
+                                          f'{column.type.compile(dialect=db.engine.dialect)}'))
+                    logger.info(f"Added column {Trade.__tablename__}.{name}")
+            for index in Trade.__table__.indexes:
+                index.create(db.engine, checkfirst=True)
     except Exception as e:
-        logger.error(f"Email sending error: {e}")
+        logger.error(f"Error migrating the trade table: {e}")
+# Helper Functions
 def send_welcome_email(user_email, username):
     content = f"""
     <html>
@@ -129,115 +217,167 @@ def send_welcome_email(user_email, username):
     </body>
     </html>
     """
-    threading.Thread(target=send_email_async, args=(user_email, "Welcome to ShadowStrike Options!", content)).start()
-@retry(tries=3, delay=2, backoff=2, logger=logger)
-def fetch_stock_data(symbol, period="3mo", interval="1d"):
+    send_email_async(user_email, "Welcome to ShadowStrike Options!", content)
+# "yfinance" in production; "fixtures:<dir>" or "synthetic" replay offline data for benchmarks
+@lazy_client
+def get_market_provider():
+    from providers import make_provider
+    return make_provider(os.environ.get('MARKET_DATA_PROVIDER', 'yfinance'))
+# Every market data download goes through one gateway per process: a shared rate limit,
+# adaptive concurrency, a circuit breaker serving last-known-good data, and background retries
+market_gateway = MarketDataGateway(
+    'market-data',
+    rate=float(os.environ.get('MARKET_DATA_RATE', 5)),
+    burst=int(os.environ.get('MARKET_DATA_BURST', 10)),
+    concurrency=int(os.environ.get('MARKET_DATA_CONCURRENCY', 4)),
+    max_concurrency=int(os.environ.get('MARKET_DATA_MAX_CONCURRENCY', 16)),
+    failure_threshold=int(os.environ.get('MARKET_DATA_FAILURE_THRESHOLD', 5)),
+    reset_timeout=int(os.environ.get('MARKET_DATA_CIRCUIT_SECONDS', 30)),
+    acquire_timeout=float(os.environ.get('MARKET_DATA_ACQUIRE_TIMEOUT', 5))
+)
+metrics.register_gateways([market_gateway])
+def _download_history(symbol, interval, period=None, start=None):
+    provider = get_market_provider()
+    def download():
+        with metrics.upstream(provider.name, 'history'):
+            return provider.history(symbol, interval, period=period, start=start)
     try:
-        stock = yf.Ticker(symbol)
-        df = stock.history(period=period, interval=interval)
-        if df.empty:
-            raise ValueError("No data returned")
-        return df
+        return market_gateway.call(('history', symbol, interval, period, start), download)
     except Exception as e:
         logger.error(f"Error fetching data for {symbol}: {e}")
         raise
-def fetch_options_data(symbol):
+@lazy_client
+def get_history_store():
+    from history_store import HistoryStore
+    return HistoryStore(os.environ.get('HISTORY_DIR', 'data/history'), _download_history)
+def fetch_stock_data(symbol, period="3mo", interval="1d"):
+    return stock_data_cache.get_or_load((symbol, period, interval), lambda: get_history_store().get(symbol, interval, period))
+# Re-solve chain IVs from bid/ask mids instead of trusting the vendor's, which stale last prices skew
+SOLVE_CHAIN_IV = os.environ.get('SOLVE_CHAIN_IV', '1') == '1'
+chain_ivs = metrics.registry.counter(
+    'shadowstrike_chain_iv_total', 'Option chain implied vols by source', ('source',))
+def _download_option_chain(symbol):
+    from chains import normalize_chain, ChainIndex
+    metrics.count('chain_downloads')
+    provider = get_market_provider()
+    def download():
+        with metrics.upstream(provider.name, 'option_chain'):
+            return provider.option_chain(symbol)
+    chain = normalize_chain(market_gateway.call(('option_chain', symbol), download))
+    if SOLVE_CHAIN_IV and not chain.empty:
+        from pricing import solve_chain_iv
+        try:
+            spot = float(fetch_stock_data(symbol, period=INDICATOR_HISTORY_PERIOD)['Close'].iloc[-1])
+            chain, solved = solve_chain_iv(chain, spot, RISK_FREE_RATE)
+            chain_ivs.inc(int(solved.sum()), source='solved')
+            chain_ivs.inc(int((~solved).sum()), source='vendor')
+        except Exception as e:
+            logger.error(f"Could not solve implied vols for {symbol}, keeping vendor IVs: {e}")
+    return ChainIndex(chain)
+def fetch_chain_index(symbol):
+    metrics.count('chain_fetches')
     try:
-        stock = yf.Ticker(symbol)
-        expirations = stock.options
-        options = []
-        for exp in expirations[:5]:
-            opt = stock.option_chain(exp)
-            for type_, chain in [("CALL", opt.calls), ("PUT", opt.puts)]:
-                for _, row in chain.iterrows():
-                    days_to_expiry = (datetime.strptime(exp, "%Y-%m-%d") - datetime.now()).days
-                    options.append({
-                        "type": type_,
-                        "strike": round(row["strike"], 2),
-                        "expiration": exp,
-                        "price": round(row["lastPrice"], 2),
-                        "bid": round(row["bid"], 2),
-                        "ask": round(row["ask"], 2),
-                        "volume": int(row["volume"]) if pd.notna(row["volume"]) else 0,
-                        "openInterest": int(row["openInterest"]) if pd.notna(row["openInterest"]) else 0,
-                        "impliedVolatility": round(row["impliedVolatility"] * 100, 1) if pd.notna(row["impliedVolatility"]) else 20,
-                        "daysToExpiry": days_to_expiry
-                    })
-        return sorted(options, key=lambda x: (x["expiration"], x["strike"]))
+        return options_cache.get_or_load(symbol, lambda: _download_option_chain(symbol))
     except Exception as e:
         logger.error(f"Error fetching options for {symbol}: {e}")
-        return []
+        from chains import empty_chain, ChainIndex
+        return ChainIndex(empty_chain())
+# With MARKET_CACHE_BACKEND set, histories and chains are shared across workers
+# as compact column buffers (frame_codec), not pickles
+def _encode_frame(df):
+    from frame_codec import encode_frame
+    return encode_frame(df)
+def _decode_frame(data):
+    from frame_codec import decode_frame
+    return decode_frame(data)
+def _decode_chain(data):
+    from chains import ChainIndex
+    return ChainIndex(_decode_frame(data))
+if shared_backend is not None:
+    stock_data_cache.share(shared_backend, _encode_frame, _decode_frame)
+    options_cache.share(shared_backend, lambda index: _encode_frame(index.chain), _decode_chain)
+def fetch_option_chain(symbol):
+    return fetch_chain_index(symbol).chain
+def fetch_options_data(symbol):
+    from chains import chain_records
+    return chain_records(fetch_option_chain(symbol))
+RISK_FREE_RATE = 0.05
 def black_scholes(S, K, T, r, sigma, option_type="CALL"):
-    try:
-        d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        if option_type == "CALL":
-            prob_itm = norm.cdf(d1)
-        else:
-            prob_itm = norm.cdf(-d1)
-        return round(prob_itm * 100, 1), round((1 - prob_itm) * 100, 1)
-    except:
+    from pricing import price_options
+    prob_itm = float(price_options(S, K, T, r, sigma, option_type == "CALL")["prob_itm"])
+    if not math.isfinite(prob_itm):
         return 50, 50
-def calculate_vertical_spread(symbol, options, spread_type="bull_call"):
-    try:
-        calls = [opt for opt in options if opt["type"] == "CALL"]
-        puts = [opt for opt in options if opt["type"] == "PUT"]
-        if spread_type == "bull_call":
-            buy = min(calls, key=lambda x: x["strike"])
-            sell = min([c for c in calls if c["strike"] > buy["strike"]], key=lambda x: x["strike"])
-            max_profit = (sell["strike"] - buy["strike"] - (buy["price"] - sell["price"])) * 100
-            max_loss = (buy["price"] - sell["price"]) * 100
-            breakeven = buy["strike"] + (buy["price"] - sell["price"])
-        elif spread_type == "bear_put":
-            buy = max(puts, key=lambda x: x["strike"])
-            sell = max([p for p in puts if p["strike"] < buy["strike"]], key=lambda x: x["strike"])
-            max_profit = (buy["strike"] - sell["strike"] - (buy["price"] - sell["price"])) * 100
-            max_loss = (buy["price"] - sell["price"]) * 100
-            breakeven = buy["strike"] - (buy["price"] - sell["price"])
-        return {
-            "type": spread_type,
-            "buy_strike": buy["strike"],
-            "sell_strike": sell["strike"],
-            "max_profit": round(max_profit, 2),
-            "max_loss": round(max_loss, 2),
-            "breakeven": round(breakeven, 2),
-            "probability": buy["probability"]
-        }
-    except:
-        return None
+    return round(prob_itm * 100, 1), round((1 - prob_itm) * 100, 1)
+def score_options(chain, spot, rate=RISK_FREE_RATE):
+    from pricing import price_chain
+    greeks = price_chain(chain, spot, rate)
+    return chain.assign(
+        theoreticalPrice=greeks["price"].round(2),
+        delta=greeks["delta"].round(4),
+        gamma=greeks["gamma"].round(4),
+        theta=greeks["theta"].round(4),
+        vega=greeks["vega"].round(4),
+        rho=greeks["rho"].round(4),
+        probabilityITM=(greeks["prob_itm"] * 100).round(1),
+        probabilityOTM=((1 - greeks["prob_itm"]) * 100).round(1),
+        priced=greeks["valid"]
+    )
+def scored_contracts(symbol, chain, spot, limit=None):
+    scored = score_options(chain, spot)
+    if limit is not None:
+        # Expired and zero-vol contracts sit at 0/100% and would crowd out the ranking
+        scored = scored[scored['priced']].nlargest(limit, 'probabilityITM')
+    return [{
+        'symbol': symbol,
+        'type': opt['type'],
+        'strike': opt['strike'],
+        'expiration': opt['expiration'],
+        'price': opt['price'],
+        'theoreticalPrice': opt['theoreticalPrice'],
+        'delta': opt['delta'],
+        'gamma': opt['gamma'],
+        'theta': opt['theta'],
+        'vega': opt['vega'],
+        'rho': opt['rho'],
+        'probabilityITM': opt['probabilityITM'],
+        'probabilityOTM': opt['probabilityOTM']
+    } for opt in scored.to_dict('records')]
+# Comma-separated symbols and "@file" lists, e.g. "@universes/sp500.txt,@universes/liquid_etfs.txt"
+SCANNER_SYMBOLS = load_universe(os.environ.get('SCANNER_UNIVERSE', 'SPY,QQQ,GLD,SLV'))
+# Worker processes the scan is sharded across; 0 scans on the refresher thread
+SCANNER_PROCESSES = int(os.environ.get('SCANNER_PROCESSES', 0))
+# Contracts below these are dropped before any pricing
+SCANNER_MIN_VOLUME = int(os.environ.get('SCANNER_MIN_VOLUME', 1))
+SCANNER_MIN_OPEN_INTEREST = int(os.environ.get('SCANNER_MIN_OPEN_INTEREST', 10))
+RANKING_SIZE = 10
+SPREAD_SCORE = os.environ.get('SPREAD_SCORE', 'expected_value')
+def fetch_symbol_data(symbol):
+    return analyze_stock(symbol), fetch_chain_index(symbol)
+def unavailable_entry(symbol, error):
+    return {'symbol': symbol, 'status': 'unavailable', 'error': error}
+# MA150 needs ~150 trading days, so warm up from a year of daily bars
+INDICATOR_HISTORY_PERIOD = "1y"
 def analyze_stock(symbol):
     try:
-        df = fetch_stock_data(symbol)
+        df = fetch_stock_data(symbol, period=INDICATOR_HISTORY_PERIOD)
         if df is None:
             return {"symbol": symbol, "recommendation": "No data", "details": {}}
-        # Technical indicators
-        df['RSI'] = RSIIndicator(df['Close']).rsi()
-        df['MACD'] = MACD(df['Close']).macd_diff()
-        df['ADX'] = ADXIndicator(df['High'], df['Low'], df['Close']).adx()
-                df['MA25'] = df['Close'].rolling(window=25).mean()
-        df['MA50'] = df['Close'].rolling(window=50).mean()
-        df['MA150'] = df['Close'].rolling(window=150).mean()
+        # Technical indicators, updated incrementally from the per-symbol state
+        from indicators import indicator_store
+        latest, previous = indicator_store.update(symbol, df)
+        if not previous:
+            return {"symbol": symbol, "recommendation": "No data", "details": {}}
         # Volatility and stop-loss
-        volatility = df['Close'].pct_change().rolling(window=30).std()[-1] * 100
-        iv = fetch_options_data(symbol)[0]["impliedVolatility"] if fetch_options_data(symbol) else 20
-        stop_loss = round(df['Close'].iloc[-1] * (1 - volatility / 100), 2)
-        latest = df.iloc[-1]
-        signals = []
-        if latest['MACD'] > 0 and df['MACD'].iloc[-2] <= 0:
-            signals.append("MACD Crossover (Bullish)")
-        elif latest['MACD'] < 0 and df['MACD'].iloc[-2] >= 0:
-            signals.append("MACD Crossover (Bearish)")
-        if latest['PPO'] > 0 and df['PPO'].iloc[-2] <= 0:
-                    elif latest['PPO'] < 0 and df['PPO'].iloc[-2] >= 0:
-                    if latest['Close'] > latest['MA50'] and df['Close'].iloc[-2] <= df['MA50'].iloc[-2]:
-            signals.append("Price/MA50 Crossover (Bullish)")
-        recommendation = "Hold"
-        if latest['RSI'] < 30 and latest['MACD'] > 0 and latest['ADX'] > 25:
-            recommendation = "Call (Bullish)"
-        elif latest['RSI'] > 70 and latest['MACD'] < 0 and latest['ADX'] > 25:
-            recommendation = "Put (Bearish)"
+        volatility = latest['Volatility']
+        chain = fetch_option_chain(symbol)
+        iv = chain["impliedVolatility"].iloc[0] if not chain.empty else 20
+        stop_loss = round(latest['Close'] * (1 - volatility / 100), 2)
+        from signals import recommendation, crossover_signals
+        signals = crossover_signals(latest, previous)
+        recommended = recommendation(latest, previous)
         return {
             "symbol": symbol,
-            "recommendation": recommendation,
+            "recommendation": recommended,
             "details": {
                 "RSI": round(latest['RSI'], 2),
                 "MACD": round(latest['MACD'], 2),
@@ -254,6 +394,223 @@ def analyze_stock(symbol):
     except Exception as e:
         logger.error(f"Analysis error for {symbol}: {e}")
         return {"symbol": symbol, "recommendation": "Error", "details": {"Error": str(e)}}
+# Quotes and movers for /api/stream, /market-data and the dashboard
+MARKET_WATCHLIST = os.environ.get('MARKET_WATCHLIST', 'SPY,QQQ,AAPL,MSFT,TSLA,GOOGL,AMZN,NVDA,META,NFLX').split(',')
+def fetch_quote(symbol):
+    # Straight from the history store, which tops up with a small delta fetch,
+    # since the stock data cache would hold quotes for minutes
+    df = get_history_store().get(symbol, "1d", "5d")
+    price = float(df['Close'].iloc[-1])
+    previous_close = float(df['Close'].iloc[-2]) if len(df) > 1 else price
+    change = price - previous_close
+    return {
+        'symbol': symbol,
+        'price': round(price, 2),
+        'change': round(change, 2),
+        'change_percent': round(change / previous_close * 100, 2) if previous_close else 0.0,
+        'volume': int(df['Volume'].iloc[-1]),
+        'market_cap': None
+    }
+def fetch_quotes(symbols):
+    return {symbol: quote for symbol, quote, error in map_symbols(fetch_quote, symbols) if not error}
+def streamable(symbol):
+    # Stream clients may add scanner symbols or ones this worker already holds data for,
+    # never arbitrary tickers that would each cost a download every interval
+    return symbol in SCANNER_SYMBOLS or any(key[0] == symbol for key in stock_data_cache.keys())
+market_stream = MarketStream(fetch_quotes, market_status, MARKET_WATCHLIST,
+                             interval=int(os.environ.get('MARKET_STREAM_INTERVAL', 15)),
+                             max_symbols=int(os.environ.get('MARKET_STREAM_MAX_SYMBOLS', 200)),
+                             allowed=streamable)
+def get_market_status():
+    return market_status()
+def get_top_movers():
+    return list(market_stream.current().data['movers'])
+def fetch_position_data(symbol):
+    try:
+        spot = round(float(fetch_stock_data(symbol, period=INDICATOR_HISTORY_PERIOD)['Close'].iloc[-1]), 2)
+    except Exception as e:
+        logger.error(f"Error fetching price for {symbol}: {e}")
+        spot = None
+    return spot, fetch_chain_index(symbol)
+def open_positions(trades):
+    # The open trades, and the symbols to fetch for them: one chain and one spot
+    # fetch per symbol, however many trades reference it
+    open_trades = [t for t in trades if t.status == 'open']
+    return open_trades, sorted({t.symbol for t in open_trades})
+def value_open_trades(trades):
+    open_trades, symbols = open_positions(trades)
+    return value_fetched_trades(open_trades, map_symbols(fetch_position_data, symbols))
+def value_fetched_trades(open_trades, fetched):
+    # fetched: (symbol, (spot, chain index), error) tuples, as map_symbols returns them
+    from valuation import positions_frame, value_positions
+    spots = {}
+    indexes = {}
+    for symbol, result, error in fetched:
+        if not error:
+            spots[symbol], indexes[symbol] = result
+    valued = value_positions(positions_frame(open_trades), indexes,
+                             {symbol: spot for symbol, spot in spots.items() if spot is not None}, RISK_FREE_RATE)
+    save_pnl(open_trades, valued['pnl'].tolist())
+    return open_trades, valued, spots
+TRADE_PNL_UPDATE = update(Trade.__table__).where(Trade.__table__.c.id == bindparam('trade_id')).values(pnl=bindparam('new_pnl'))
+def save_pnl(trades, pnls):
+    # One executemany UPDATE for the rows whose P&L moved, instead of dirtying every object.
+    # It runs on its own connection so committing does not expire the loaded trades.
+    changed = [{'trade_id': trade.id, 'new_pnl': pnl} for trade, pnl in zip(trades, pnls) if trade.pnl != pnl]
+    if not changed:
+        return
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(TRADE_PNL_UPDATE, changed)
+    except Exception as e:
+        logger.error(f"Error saving P&L for {len(changed)} trades: {e}")
+        return
+    for trade, pnl in zip(trades, pnls):
+        set_committed_value(trade, 'pnl', pnl)
+def spread_entry(symbol, spread):
+    return {
+        'symbol': symbol,
+        'type': spread['type'],
+        'buy_strike': spread['buy_strike'],
+        'sell_strike': spread['sell_strike'],
+        'max_profit': spread['max_profit'],
+        'max_loss': spread['max_loss'],
+        'expiration': spread['expiration'],
+        'breakeven': spread['breakeven'],
+        'probabilityITM': spread['probability'],
+        'expected_value': spread['expected_value']
+    }
+def liquid_index(index):
+    from chains import ChainIndex
+    chain = index.chain
+    liquid = (chain['volume'] >= SCANNER_MIN_VOLUME) & (chain['openInterest'] >= SCANNER_MIN_OPEN_INTEREST)
+    return index if liquid.all() else ChainIndex(chain[liquid].reset_index(drop=True))
+def scan_symbol(symbol):
+    # A symbol's own best candidates; its chain is dropped as soon as they are picked
+    from spreads import search_verticals
+    analysis, index = fetch_symbol_data(symbol)
+    index = liquid_index(index)
+    S = analysis['details'].get('Price', 100)
+    scanner_results = []
+    top10_results = []
+    # Every contract is scored; only the symbol's best ten can reach the top 10
+    for contract in scored_contracts(symbol, index.chain, S, limit=RANKING_SIZE):
+        scanner_results.append(dict(contract, recommendation=analysis['recommendation']))
+        top10_results.append(dict(
+            contract,
+            signals=analysis['signals'],
+            score=contract['probabilityITM'] + (10 if analysis['signals'] else 0)
+        ))
+    for spread in search_verticals(index, S, RISK_FREE_RATE, top_k=1, score=SPREAD_SCORE):
+        scanner_results.append(spread_entry(symbol, spread))
+        top10_results.append(spread_entry(symbol, spread))
+    return scanner_results, top10_results
+def scanner_rank(entry):
+    return entry['probabilityITM']
+def top10_rank(entry):
+    return entry['score'] if 'score' in entry else entry['probabilityITM']
+def scan_shard(symbols):
+    # Runs on the refresher thread or in a scanner worker process, and returns only
+    # the shard's top entries so memory stays flat however large the universe is
+    scanner_top = TopK(RANKING_SIZE, scanner_rank)
+    top10_top = TopK(RANKING_SIZE, top10_rank)
+    degraded = []
+    timeout = SYMBOL_TIMEOUT * math.ceil(len(symbols) / SCAN_WORKERS)
+    for symbol, fetched, error in map_symbols(scan_symbol, symbols, timeout, scan_executor):
+        if error:
+            degraded.append(unavailable_entry(symbol, error))
+            continue
+        scanner_top.extend(fetched[0])
+        top10_top.extend(fetched[1])
+    return scanner_top.items(), top10_top.items(), degraded
+def compute_rankings():
+    # One fetch/analysis pass feeds both the scanner and the top 10 ranking
+    scanner_top = TopK(RANKING_SIZE, scanner_rank)
+    top10_top = TopK(RANKING_SIZE, top10_rank)
+    degraded = []
+    for scanner_results, top10_results, failed in scan_universe(SCANNER_SYMBOLS, scan_shard, SCANNER_PROCESSES):
+        scanner_top.extend(scanner_results)
+        top10_top.extend(top10_results)
+        degraded.extend(failed)
+    return {'scanner': scanner_top.items(), 'top10': top10_top.items(), 'degraded': degraded}
+rankings = SnapshotRefresher('rankings', compute_rankings, interval=int(os.environ.get('RANKINGS_REFRESH_SECONDS', 60)))
+DAILY_PICKS_ALERT = 'daily_picks'
+DAILY_PICKS_SUBJECT = "ShadowStrike Daily Picks"
+def render_daily_picks(picks):
+    # Rendered once per run; Brevo fills {{ params.username }} for each recipient
+    items = ''.join([f"<li>{item['symbol']} {item['type']} ${item.get('strike') or item['buy_strike']}: {item['probabilityITM']}% ITM</li>" for item in picks])
+    return f"""
+    <html>
+    <body style="font-family: Arial; background: #1f2937; color: white; padding: 40px;">
+        <div style="max-width: 600px; margin: 0 auto; background: linear-gradient(135deg, #065f46, #10b981); padding: 30px; border-radius: 15px;">
+            <h1 style="color: #ffffff; text-align: center;"> Daily Top 10 Picks</h1>
+            <h2>Hello {{{{ params.username }}}}!</h2>
+            <ul>{items}</ul>
+        </div>
+    </body>
+    </html>
+    """
+def send_daily_picks(run_date):
+    with app.app_context():
+        picks = list(rankings.get().data['top10'])
+        if not picks:
+            logger.warning(f"No daily picks for {run_date}, skipping")
+            return
+        # A user counts as mailed once a daily_picks alert exists for them since midnight market time
+        day_start = datetime.combine(run_date, datetime.min.time(), tzinfo=scheduler.timezone)
+        day_start = day_start.astimezone(timezone.utc).replace(tzinfo=None)
+        mailed = {alert.user_id for alert in EmailAlert.query.filter(
+            EmailAlert.alert_type == DAILY_PICKS_ALERT, EmailAlert.sent_at >= day_start).all()}
+        users = [user for user in User.query.filter_by(email_alerts_enabled=True).all() if str(user.id) not in mailed]
+        if not users:
+            return
+        content = render_daily_picks(picks)
+        # Claim the rows before sending so a crash mid-run never mails anyone twice
+        db.session.add_all([EmailAlert(user_id=str(user.id), alert_type=DAILY_PICKS_ALERT,
+                                       subject=DAILY_PICKS_SUBJECT) for user in users])
+        db.session.commit()
+        get_notifier().send_bulk_email([(user.email, {'username': user.username}) for user in users],
+                                 DAILY_PICKS_SUBJECT, content)
+        logger.info(f"Queued daily picks for {len(users)} users")
+scheduler = DailyScheduler(os.environ.get('SCHEDULER_TIMEZONE', 'America/New_York'),
+                           lock_path=os.environ.get('SCHEDULER_LOCK_FILE'))
+scheduler.add_job(DAILY_PICKS_ALERT, send_daily_picks,
+                  hour=int(os.environ.get('DAILY_PICKS_HOUR', 8)), minute=int(os.environ.get('DAILY_PICKS_MINUTE', 0)))
+@lazy_client
+def start_services():
+    # Database setup and background threads, once per worker process and never at import,
+    # so workers forked from a preloaded app each get their own threads
+    ensure_trade_indexes()
+    if os.environ.get('RANKINGS_BACKGROUND_REFRESH', '1') == '1':
+        rankings.start()
+    if os.environ.get('SCHEDULER_ENABLED', '1') == '1':
+        scheduler.start()
+    return True
+def create_app():
+    # Entry point for WSGI servers, e.g. gunicorn "app:create_app()"; see asgi.py for the async mode
+    start_services()
+    return app
+@app.before_request
+def ensure_services():
+    # Servers that import `app` directly start services on their first request
+    start_services()
+# Cache-Control max-age for the JSON APIs, by market session
+HTTP_CACHE_OPEN_SECONDS = int(os.environ.get('HTTP_CACHE_OPEN_SECONDS', 15))
+HTTP_CACHE_CLOSED_SECONDS = int(os.environ.get('HTTP_CACHE_CLOSED_SECONDS', 300))
+snapshot_bodies = http_cache.RepresentationCache()
+def api_cache_control(private=False):
+    return http_cache.cache_control(market_status()['is_open'], HTTP_CACHE_OPEN_SECONDS,
+                                    HTTP_CACHE_CLOSED_SECONDS, private=private)
+def snapshot_response(snapshot, key):
+    body = snapshot_bodies.get(key, snapshot.version, lambda: app.json.dumps(list(snapshot.data[key])))
+    response = http_cache.respond(body, api_cache_control())
+    response.headers['X-Snapshot-Version'] = str(snapshot.version)
+    response.headers['X-Snapshot-Generated-At'] = snapshot.generated_at.isoformat() + 'Z'
+    # Symbols left out of this snapshot; clients read the body as picks only
+    degraded = [entry['symbol'] for entry in snapshot.data['degraded']]
+    if degraded:
+        response.headers['X-Degraded-Symbols'] = ','.join(degraded)
+    return response
 # Routes
 @app.route('/')
 def index():
@@ -287,7 +644,8 @@ def login():
         try:
             email = request.form.get('email')
             password = request.form.get('password')
-            user = auth.sign_in_with_email_and_password(email, password)
+            with metrics.upstream('firebase', 'sign_in'):
+                user = get_firebase_auth().sign_in_with_email_and_password(email, password)
             session['user_id'] = user['localId']
             session['email'] = user['email']
             flash('Login successful!', 'success')
@@ -303,7 +661,8 @@ def register():
             password = request.form.get('password')
             username = request.form.get('username')
             color = request.form.get('color', '#10b981')
-            user = auth.create_user(email=email, password=password)
+            with metrics.upstream('firebase', 'create_user'):
+                user = get_firebase_auth().create_user(email=email, password=password)
             db.session.add(User(
                 id=user.uid,
                 username=username,
@@ -324,48 +683,49 @@ def reset_password():
     if request.method == 'POST':
         try:
             email = request.form.get('email')
-            auth.send_password_reset_email(email)
+            with metrics.upstream('firebase', 'password_reset'):
+                get_firebase_auth().send_password_reset_email(email)
             flash('Password reset email sent', 'success')
             return redirect(url_for('login'))
         except:
             flash('Email not found', 'error')
     return render_template('reset_password.html')
-@app.route('/dashboard')
-def dashboard():
+def dashboard_user():
+    # (user, None) for a subscriber, else (None, the redirect to send instead)
     if 'user_id' not in session:
         flash('Please login to access the dashboard', 'error')
-        return redirect(url_for('login'))
+        return None, redirect(url_for('login'))
     user = User.query.get(session['user_id'])
     if not user or (user.subscription_status == 'trial' and datetime.utcnow() > user.trial_end_date):
         flash('Your trial has expired. Please subscribe.', 'error')
-        return redirect(url_for('subscribe'))
+        return None, redirect(url_for('subscribe'))
+    return user, None
+def user_open_trades(user_id):
+    return Trade.query.filter_by(user_id=user_id, status='open').all()
+@app.route('/dashboard')
+def dashboard():
+    user, denied = dashboard_user()
+    if denied is not None:
+        return denied
     market_status = get_market_status()
     top_movers = get_top_movers()
-    trades = Trade.query.filter_by(user_id=session['user_id']).all()
-    total_pnl = 0
-    open_trades = 0
-    enhanced_trades = []
-    for trade in trades:
-        if trade.status == 'open':
-            open_trades += 1
-            stock_data = get_stock_price(trade.symbol)
-            current_stock_price = stock_data['price']
-            options = fetch_options_data(trade.symbol)
-            current_option = next((opt for opt in options if opt['type'] == trade.option_type and opt['strike'] == trade.strike_price), None)
-            current_price = current_option['price'] if current_option else trade.entry_price
-            pnl = (current_price - trade.entry_price) * trade.quantity * 100 - trade.broker_fee * trade.quantity
-            trade.pnl = round(pnl, 2)
-            enhanced_trades.append({
-                'trade': trade,
-                'current_stock_price': current_stock_price,
-                'current_option_price': round(current_price, 2),
-                'pnl': trade.pnl
-            })
+    open_trades, valued, spots = value_open_trades(user_open_trades(session['user_id']))
+    return render_dashboard(user, open_trades, valued, spots, market_status, top_movers)
+def render_dashboard(user, open_trades, valued, spots, market_status, top_movers):
+    enhanced_trades = [{
+        'trade': trade,
+        'current_stock_price': spots.get(trade.symbol),
+        'current_option_price': current_price,
+        'pnl': pnl,
+        'probability': None if math.isnan(probability) else probability
+    } for trade, current_price, pnl, probability in zip(
+        open_trades, valued['current_price'].tolist(), valued['pnl'].tolist(), valued['probability'].tolist())]
+    total_pnl = round(float(valued['pnl'].sum()), 2)
     return render_template('dashboard.html', 
                          user=user, 
                          trades=enhanced_trades, 
                          total_pnl=total_pnl,
-                         open_trades=open_trades,
+                         open_trades=len(open_trades),
                          market_status=market_status,
                          top_movers=top_movers)
 @app.route('/subscribe')
@@ -383,21 +743,22 @@ def create_checkout_session():
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     try:
-        session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=[{
-                'price_data': {
-                    'currency': 'usd',
-                    'product_data': {'name': 'ShadowStrike Subscription'},
-                    'unit_amount': 4900,
-                    'recurring': {'interval': 'month'}
-                },
-                'quantity': 1
-            }],
-            mode='subscription',
-            success_url='https://shadowstrike-options-2025.onrender.com/dashboard',
-            cancel_url='https://shadowstrike-options-2025.onrender.com/subscribe'
-        )
+        with metrics.upstream('stripe', 'checkout_session'):
+            session = get_stripe().checkout.Session.create(
+                payment_method_types=['card'],
+                line_items=[{
+                    'price_data': {
+                        'currency': 'usd',
+                        'product_data': {'name': 'ShadowStrike Subscription'},
+                        'unit_amount': 4900,
+                        'recurring': {'interval': 'month'}
+                    },
+                    'quantity': 1
+                }],
+                mode='subscription',
+                success_url='https://shadowstrike-options-2025.onrender.com/dashboard',
+                cancel_url='https://shadowstrike-options-2025.onrender.com/subscribe'
+            )
         user = User.query.get(session['user_id'])
         user.stripe_customer_id = session.customer
         user.stripe_subscription_id = session.subscription
@@ -413,56 +774,34 @@ def market_data():
     market_status = get_market_status()
     top_movers = get_top_movers()
     return render_template('market_data.html', market_status=market_status, top_movers=top_movers)
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_MAX_SYMBOLS = 50
+SYMBOL_RE = re.compile(r'^[A-Z0-9.^=-]{1,10}$')
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+def stream_subscribe(loop=None):
+    # ?symbols=SPY,QQQ picks the quotes (default: the watchlist) among the symbols streamable() accepts;
+    # ?movers=0 drops the movers. asgi.py passes its event loop to await the events there.
+    symbols = [s for s in request.args.get('symbols', '').upper().split(',') if SYMBOL_RE.match(s)]
+    return market_stream.subscribe(symbols[:STREAM_MAX_SYMBOLS], request.args.get('movers', '1') != '0', loop)
+@app.route('/api/stream')
+def stream_market_data():
+    # Server-Sent Events: one "snapshot" event, then "delta" events with only what changed
+    subscription = stream_subscribe()
+    def events():
+        yield 'retry: 5000\n' + market_stream.snapshot_event(subscription)
+        while True:
+            yield market_stream.next_event(subscription, STREAM_HEARTBEAT_SECONDS) or ': keepalive\n\n'
+    response = Response(events(), mimetype='text/event-stream', headers=STREAM_HEADERS)
+    response.call_on_close(lambda: market_stream.unsubscribe(subscription))
+    return response
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 @app.route('/api/top10', methods=['GET'])
 def get_top10():
-    symbols = ['SPY', 'QQQ', 'GLD', 'SLV']
-    results = []
-    for symbol in symbols:
-        analysis = analyze_stock(symbol)
-        options = fetch_options_data(symbol)
-        for opt in options[:2]:
-            S = analysis['details'].get('Price', 100)
-            prob_itm, prob_otm = black_scholes(S, opt['strike'], opt['daysToExpiry']/365, 0.05, opt['impliedVolatility']/100, opt['type'])
-            results.append({
-                'symbol': symbol,
-                'type': opt['type'],
-                'strike': opt['strike'],
-                'expiration': opt['expiration'],
-                'price': opt['price'],
-                'probabilityITM': prob_itm,
-                'probabilityOTM': prob_otm,
-                'signals': analysis['signals'],
-                'score': prob_itm + (10 if analysis['signals'] else 0)
-            })
-        spread = calculate_vertical_spread(symbol, options)
-        if spread:
-            results.append({
-                'symbol': symbol,
-                'type': spread['type'],
-                'buy_strike': spread['buy_strike'],
-                'sell_strike': spread['sell_strike'],
-                'max_profit': spread['max_profit'],
-                'max_loss': spread['max_loss'],
-                'breakeven': spread['breakeven'],
-                'probabilityITM': spread['probability']
-            })
-    results.sort(key=lambda x: x['score'] if 'score' in x else x['probabilityITM'], reverse=True)
-    # Send daily picks email (8-9 AM)
-    now = datetime.now()
-    if now.weekday() < 5 and 8 <= now.hour < 9:
-        for user in User.query.filter_by(email_alerts_enabled=True).all():
-            content = f"""
-            <html>
-            <body style="font-family: Arial; background: #1f2937; color: white; padding: 40px;">
-                <div style="max-width: 600px; margin: 0 auto; background: linear-gradient(135deg, #065f46, #10b981); padding: 30px; border-radius: 15px;">
-                    <h1 style="color: #ffffff; text-align: center;"> Daily Top 10 Picks</h1>
-                    <ul>{''.join([f"<li>{item['symbol']} {item['type']} ${item['strike'] or item['buy_strike']}: {item['probabilityITM']}% ITM</li>" for item in results[:10]])}</ul>
-                </div>
-            </body>
-            </html>
-            """
-            threading.Thread(target=send_email_async, args=(user.email, "ShadowStrike Daily Picks", content)).start()
-    return jsonify(results[:10])
+    return snapshot_response(rankings.get(), 'top10')
+PORTFOLIO_PAGE_SIZE = int(os.environ.get('PORTFOLIO_PAGE_SIZE', 50))
+PORTFOLIO_MAX_PAGE_SIZE = 500
 @app.route('/api/portfolio', methods=['GET', 'POST'])
 def portfolio():
     if 'user_id' not in session:
@@ -474,6 +813,7 @@ def portfolio():
             symbol=data['symbol'],
             option_type=data['type'],
             strike_price=data['strike'] or data['buy_strike'],
+            expiration=data.get('expiration'),
             entry_price=data['price'],
             quantity=data['contracts'],
             broker_fee=0.65 * data['contracts'],
@@ -483,78 +823,97 @@ def portfolio():
         db.session.add(trade)
         db.session.commit()
         return jsonify({'message': 'Trade added'})
-    trades = Trade.query.filter_by(user_id=session['user_id']).all()
-    for trade in trades:
-        if trade.status == 'open':
-            options = fetch_options_data(trade.symbol)
-            current = next((opt for opt in options if opt['type'] == trade.option_type and opt['strike'] == trade.strike_price), None)
-            trade.current_price = current['price'] if current else trade.entry_price
-            trade.pnl = (trade.current_price - trade.entry_price) * trade.quantity * 100 - trade.broker_fee
-    return jsonify([{
+    trades, next_cursor = portfolio_page()
+    _, valued, _ = value_open_trades(trades)
+    return portfolio_response(trades, valued, next_cursor)
+def portfolio_page():
+    # Newest first; pass the X-Next-Cursor header back as ?cursor= for the next page
+    query = Trade.query.filter_by(user_id=session['user_id'])
+    if request.args.get('status'):
+        query = query.filter_by(status=request.args['status'])
+    cursor = request.args.get('cursor', type=int)
+    if cursor is not None:
+        query = query.filter(Trade.id < cursor)
+    limit = max(1, min(request.args.get('limit', PORTFOLIO_PAGE_SIZE, type=int), PORTFOLIO_MAX_PAGE_SIZE))
+    trades = query.order_by(Trade.id.desc()).limit(limit + 1).all()
+    next_cursor = trades[limit - 1].id if len(trades) > limit else None
+    return trades[:limit], next_cursor
+def portfolio_response(trades, valued, next_cursor):
+    current_prices = dict(zip(valued['id'].tolist(), valued['current_price'].tolist()))
+    body = http_cache.Representation(app.json.dumps([{
         'symbol': t.symbol,
         'type': t.option_type,
         'strike': t.strike_price,
         'entry_price': t.entry_price,
-        'current_price': t.current_price,
+        'current_price': current_prices.get(t.id, t.exit_price if t.exit_price is not None else t.entry_price),
         'pnl': t.pnl,
         'contracts': t.quantity,
         'stop_loss': t.stop_loss,
         'target_price': t.target_price
-    } for t in trades])
+    } for t in trades]))
+    response = http_cache.respond(body, api_cache_control(private=True))
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
 @app.route('/api/scanner', methods=['GET'])
 def scanner():
-    symbols = ['SPY', 'QQQ', 'GLD', 'SLV']
-    results = []
-    for symbol in symbols:
-        analysis = analyze_stock(symbol)
-        options = fetch_options_data(symbol)
-        for opt in options[:2]:
-            S = analysis['details'].get('Price', 100)
-            prob_itm, prob_otm = black_scholes(S, opt['strike'], opt['daysToExpiry']/365, 0.05, opt['impliedVolatility']/100, opt['type'])
-            results.append({
-                'symbol': symbol,
-                'type': opt['type'],
-                'strike': opt['strike'],
-                'expiration': opt['expiration'],
-                'price': opt['price'],
-                'probabilityITM': prob_itm,
-                'probabilityOTM': prob_otm,
-                'recommendation': analysis['recommendation']
-            })
-        spread = calculate_vertical_spread(symbol, options)
-        if spread:
-            results.append({
-                'symbol': symbol,
-                'type': spread['type'],
-                'buy_strike': spread['buy_strike'],
-                'sell_strike': spread['sell_strike'],
-                'max_profit': spread['max_profit'],
-                'max_loss': spread['max_loss'],
-                'breakeven': spread['breakeven'],
-                'probabilityITM': spread['probability']
-            })
-    results.sort(key=lambda x: x['probabilityITM'], reverse=True)
-    return jsonify(results[:10])
+    return snapshot_response(rankings.get(), 'scanner')
+SCENARIO_PATHS = int(os.environ.get('SCENARIO_PATHS', 10000))
+SCENARIO_MAX_PATHS = int(os.environ.get('SCENARIO_MAX_PATHS', 100000))
+SCENARIO_MAX_SPREADS = int(os.environ.get('SCENARIO_MAX_SPREADS', 200))
+# Processes for the simulation pool; 0 simulates in the request thread
+SCENARIO_PROCESSES = int(os.environ.get('SCENARIO_PROCESSES', 0))
+def scenario_records(frame):
+    frame = frame.assign(probability_profit=(frame['probability_profit'] * 100).round(1))
+    return frame.round(2).to_dict('records')
 @app.route('/api/trade-scenario', methods=['POST'])
 def trade_scenario():
-    data = request.get_json()
+    # Monte Carlo P&L to expiry for every contract and vertical on the chain, or for one
+    # contract when type and strike are given. Optional: paths, seed, confidence, drift,
+    # jumps {intensity, mean, vol}, max_spreads, and target_price to also score the chain there.
+    from scenarios import Jumps, simulate_chain
+    from chains import ChainIndex
+    data = request.get_json() or {}
     symbol = data.get('symbol')
-    target_price = data.get('target_price')
-    options = fetch_options_data(symbol)
-    results = []
-    for opt in options[:5]:
-        S = target_price
-        prob_itm, prob_otm = black_scholes(S, opt['strike'], opt['daysToExpiry']/365, 0.05, opt['impliedVolatility']/100, opt['type'])
-        results.append({
-            'symbol': symbol,
-            'type': opt['type'],
-            'strike': opt['strike'],
-            'expiration': opt['expiration'],
-            'price': opt['price'],
-            'probabilityITM': prob_itm,
-            'probabilityOTM': prob_otm
-        })
-    return jsonify(results)
+    if not symbol:
+        return jsonify({'error': 'symbol is required'}), 400
+    try:
+        paths = int(data.get('paths', SCENARIO_PATHS))
+        seed = int(data.get('seed', 0))
+        confidence = float(data.get('confidence', 0.95))
+        drift = float(data['drift']) if data.get('drift') is not None else None
+        jumps = data.get('jumps')
+        jumps = Jumps(float(jumps['intensity']), float(jumps.get('mean', 0)), float(jumps.get('vol', 0))) if jumps else None
+        max_spreads = int(data.get('max_spreads', SCENARIO_MAX_SPREADS))
+    except (TypeError, ValueError, KeyError, AttributeError):
+        return jsonify({'error': 'Invalid scenario parameters'}), 400
+    if not 1 <= paths <= SCENARIO_MAX_PATHS or not 0 < confidence < 1 or seed < 0:
+        return jsonify({'error': f'paths must be 1-{SCENARIO_MAX_PATHS}, confidence between 0 and 1 and seed non-negative'}), 400
+    spot, index = fetch_position_data(symbol)
+    if spot is None:
+        return jsonify({'error': f'No price available for {symbol}'}), 503
+    single = data.get('type') and data.get('strike') is not None
+    if single:
+        position = index.lookup([data['type']], [float(data['strike'])], [data.get('expiration')])[0]
+        if position < 0:
+            return jsonify({'error': 'Contract not found'}), 404
+        index = ChainIndex(index.chain.iloc[[position]])
+    contracts, spreads = simulate_chain(index, spot, RISK_FREE_RATE, include_spreads=not single, drift=drift,
+                                        paths=paths, seed=seed, jumps=jumps, confidence=confidence,
+                                        processes=SCENARIO_PROCESSES)
+    result = {
+        'symbol': symbol,
+        'spot': spot,
+        'paths': paths,
+        'seed': seed,
+        'confidence': confidence,
+        'contracts': scenario_records(contracts),
+        'spreads': [] if spreads is None else scenario_records(
+            spreads.nlargest(max(max_spreads, 0), 'expected_value'))
+    }
+    if data.get('target_price') is not None:
+        result['at_target'] = scored_contracts(symbol, index.chain, float(data['target_price']))
+    return jsonify(result)
 @app.route('/logout')
 def logout():
     session.clear()
@@ -564,307 +923,6 @@ def logout():
 def mobile_demo():
     return render_template('mobile_demo.html')
 # HTML Templates
-welcome_html = """
-<!DOCTYPE html>
-<html><head><title>ShadowStrike Options</title>
-<script src="https://cdn.tailwindcss.com"></script>
-</head>
-<body class="bg-gradient-to-br from-gray-900 to-emerald-900 text-white font-sans flex items-center justify-center min-h-screen">
-    <div class="max-w-2xl mx-auto bg-gray-800/50 p-10 rounded-2xl shadow-2xl text-center">
-        <h1 class="text-4xl font-bold text-emerald-400 mb-6"> ShadowStrike Options</h1>
-        <p class="text-lg text-emerald-100 mb-8">Elite Trading Platform for Options Traders</p>
-        <div class="space-y-4">
-            <a href="/login" class="block bg-emerald-500 text-white py-3 px-6 rounded-lg font-bold hover:bg-emerald-600 transition">Login</a>
-            <a href="/register" class="block bg-emerald-500 text-white py-3 px-6 rounded-lg font-bold hover:bg-emerald-600 transition">Start 30-Day Trial</a>
-            <a href="/mobile-demo" class="block bg-emerald-500 text-white py-3 px-6 rounded-lg font-bold hover:bg-emerald-600 transition">Mobile Demo</a>
-        </div>
-    </div>
-</body></html>
-"""
-login_html = """
-<!DOCTYPE html>
-<html><head><title>Login - ShadowStrike Options</title>
-<script src="https://cdn.tailwindcss.com"></script>
-</head>
-<body class="bg-gradient-to-br from-gray-900 to-emerald-900 text-white font-sans flex items-center justify-center min-h-screen">
-    <div class="max-w-md mx-auto bg-gray-800/50 p-8 rounded-2xl shadow-2xl">
-        <h1 class="text-3xl font-bold text-emerald-400 text-center mb-6"> ShadowStrike Options</h1>
-        <h2 class="text-xl text-center mb-6">Login</h2>
-        <form method="POST" class="space-y-4">
-            <div>
-                <label class="block text-emerald-300">Email</label>
-                <input name="email" type="email" class="w-full p-3 rounded-lg bg-gray-700 border border-emerald-500 text-white" required>
-            </div>
-            <div>
-                <label class="block text-emerald-300">Password</label>
-                <input name="password" type="password" class="w-full p-3 rounded-lg bg-gray-700 border border-emerald-500 text-white" required>
-            </div>
-            <button type="submit" class="w-full bg-emerald-500 text-white py-3 rounded-lg font-bold hover:bg-emerald-600">Login</button>
-        </form>
-        <p class="text-center mt-4">
-            <a href="/reset-password" class="text-emerald-300 hover:underline">Forgot Password?</a> | 
-            <a href="/register" class="text-emerald-300 hover:underline">Register</a>
-        </p>
-    </div>
-</body></html>
-"""
-register_html = """
-<!DOCTYPE html>
-<html><head><title>Register - ShadowStrike Options</title>
-<script src="https://cdn.tailwindcss.com"></script>
-</head>
-<body class="bg-gradient-to-br from-gray-900 to-emerald-900 text-white font-sans flex items-center justify-center min-h-screen">
-    <div class="max-w-md mx-auto bg-gray-800/50 p-8 rounded-2xl shadow-2xl">
-        <h1 class="text-3xl font-bold text-emerald-400 text-center mb-6"> ShadowStrike Options</h1>
-        <h2 class="text-xl text-center mb-6">Register</h2>
-        <form method="POST" class="space-y-4">
-            <div>
-                <label class="block text-emerald-300">Username</label>
-                <input name="username" class="w-full p-3 rounded-lg bg-gray-700 border border-emerald-500 text-white" required>
-            </div>
-            <div>
-                <label class="block text-emerald-300">Email</label>
-                <input name="email" type="email" class="w-full p-3 rounded-lg bg-gray-700 border border-emerald-500 text-white" required>
-            </div>
-            <div>
-                <label class="block text-emerald-300">Password</label>
-                <input name="password" type="password" class="w-full p-3 rounded-lg bg-gray-700 border border-emerald-500 text-white" required>
-            </div>
-            <div>
-                <label class="block text-emerald-300">Theme Color (e.g., #10b981)</label>
-                <input name="color" class="w-full p-3 rounded-lg bg-gray-700 border border-emerald-500 text-white" value="#10b981">
-            </div>
-            <button type="submit" class="w-full bg-emerald-500 text-white py-3 rounded-lg font-bold hover:bg-emerald-600">Start 30-Day Trial</button>
-        </form>
-        <p class="text-center mt-4">
-            <a href="/login" class="text-emerald-300 hover:underline">Already have an account?</a>
-        </p>
-    </div>
-</body></html>
-"""
-reset_password_html = """
-<!DOCTYPE html>
-<html><head><title>Reset Password - ShadowStrike Options</title>
-<script src="https://cdn.tailwindcss.com"></script>
-</head>
-<body class="bg-gradient-to-br from-gray-900 to-emerald-900 text-white font-sans flex items-center justify-center min-h-screen">
-    <div class="max-w-md mx-auto bg-gray-800/50 p-8 rounded-2xl shadow-2xl">
-        <h1 class="text-3xl font-bold text-emerald-400 text-center mb-6"> Reset Password</h1>
-        <form method="POST" class="space-y-4">
-            <div>
-                <label class="block text-emerald-300">Email</label>
-                <input name="email" type="email" class="w-full p-3 rounded-lg bg-gray-700 border border-emerald-500 text-white" required>
-            </div>
-            <button type="submit" class="w-full bg-emerald-500 text-white py-3 rounded-lg font-bold hover:bg-emerald-600">Send Reset Email</button>
-        </form>
-        <p class="text-center mt-4">
-            <a href="/login" class="text-emerald-300 hover:underline">Back to Login</a>
-        </p>
-    </div>
-</body></html>
-"""
-dashboard_html = """
-<!DOCTYPE html>
-<html><head><title>Dashboard - ShadowStrike Options</title>
-<script src="https://cdn.tailwindcss.com"></script>
-</head>
-<body class="bg-gradient-to-br from-gray-900 to-emerald-900 text-white font-sans">
-    <div class="max-w-5xl mx-auto p-6">
-        <h1 class="text-3xl font-bold text-emerald-400 mb-6"> ShadowStrike Options - Dashboard</h1>
-        <p class="text-emerald-100">Welcome {{ user.username }}! ({{ user.subscription_status }} - {% if user.subscription_status == 'trial' %}{{ user.days_left_in_trial() }} days left{% else %}Active{% endif %})</p>
-        {% if user.subscription_status == 'trial' and user.days_left_in_trial() <= 7 %}
-        <div class="bg-red-500/20 p-4 rounded-lg mb-6">
-            <p class="text-red-300"> Trial expires in {{ user.days_left_in_trial() }} days! <a href="/subscribe" class="text-emerald-300 hover:underline">Subscribe now</a></p>
-        </div>
-        {% endif %}
-        <div class="grid grid-cols-1 md:grid-cols-2 gap-6">
-            <div class="bg-gray-800/50 p-6 rounded-lg">
-                <h2 class="text-xl font-semibold text-emerald-300 mb-4">Market Status</h2>
-                <p>Status: <strong>{{ market_status.status }}</strong></p>
-                <p>Next Open: {{ market_status.next_open }}</p>
-            </div>
-            <div class="bg-gray-800/50 p-6 rounded-lg">
-                <h2 class="text-xl font-semibold text-emerald-300 mb-4">Portfolio Summary</h2>
-                <p>Total P&L: ${{ total_pnl|round(2) }}</p>
-                <p>Open Trades: {{ open_trades }}</p>
-            </div>
-        </div>
-        <h2 class="text-xl font-semibold text-emerald-300 mt-6 mb-4">Top Market Movers</h2>
-        <div class="overflow-x-auto">
-            <table class="w-full border-collapse">
-                <thead>
-                    <tr class="bg-emerald-500/30">
-                        <th class="p-3 text-left">Symbol</th>
-                        <th class="p-3 text-left">Price</th>
-                        <th class="p-3 text-left">Change</th>
-                        <th class="p-3 text-left">% Change</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {% for mover in top_movers %}
-                    <tr class="bg-gray-800/30">
-                        <td class="p-3">{{ mover.symbol }}</td>
-                        <td class="p-3">${{ mover.price|round(2) }}</td>
-                        <td class="p-3 {{ 'text-emerald-400' if mover.change >= 0 else 'text-red-400' }}">{{ mover.change|round(2) }}</td>
-                        <td class="p-3 {{ 'text-emerald-400' if mover.change_percent >= 0 else 'text-red-400' }}">{{ mover.change_percent|round(2) }}%</td>
-                    </tr>
-                    {% endfor %}
-                </tbody>
-            </table>
-        </div>
-        <h2 class="text-xl font-semibold text-emerald-300 mt-6 mb-4">Your Trades</h2>
-        <div class="overflow-x-auto">
-            <table class="w-full border-collapse">
-                <thead>
-                    <tr class="bg-emerald-500/30">
-                        <th class="p-3 text-left">Symbol</th>
-                        <th class="p-3 text-left">Type</th>
-                        <th class="p-3 text-left">Strike</th>
-                        <th class="p-3 text-left">Entry Price</th>
-                        <th class="p-3 text-left">Current Price</th>
-                        <th class="p-3 text-left">P&L</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {% for item in trades %}
-                    <tr class="bg-gray-800/30">
-                        <td class="p-3">{{ item.trade.symbol }}</td>
-                        <td class="p-3">{{ item.trade.option_type }}</td>
-                        <td class="p-3">${{ item.trade.strike_price|round(2) }}</td>
-                        <td class="p-3">${{ item.trade.entry_price|round(2) }}</td>
-                        <td class="p-3">${{ item.current_option_price|round(2) }}</td>
-                        <td class="p-3 {{ 'text-emerald-400' if item.pnl >= 0 else 'text-red-400' }}">{{ item.pnl|round(2) }}</td>
-                    </tr>
-                    {% endfor %}
-                </tbody>
-            </table>
-        </div>
-        <div class="mt-6 space-x-4">
-            <a href="/logout" class="text-red-400 hover:underline">Logout</a>
-            <a href="/subscribe" class="text-emerald-300 hover:underline">Subscribe</a>
-            <a href="/mobile-demo" class="text-emerald-300 hover:underline">Mobile App</a>
-        </div>
-    </div>
-</body></html>
-"""
-subscribe_html = """
-<!DOCTYPE html>
-<html><head><title>Subscribe - ShadowStrike Options</title>
-<script src="https://cdn.tailwindcss.com"></script>
-<script src="https://js.stripe.com/v3/"></script>
-</head>
-<body class="bg-gradient-to-br from-gray-900 to-emerald-900 text-white font-sans flex items-center justify-center min-h-screen">
-    <div class="max-w-2xl mx-auto bg-gray-800/50 p-10 rounded-2xl shadow-2xl text-center">
-        <h1 class="text-3xl font-bold text-emerald-400 mb-6"> Continue Your Trading Success</h1>
-        <p class="text-lg text-emerald-100 mb-8">Don't lose access to profitable trading opportunities!</p>
-        <div class="bg-red-500/20 p-6 rounded-lg mb-8">
-            <h2 class="text-xl text-red-300"> {{ user.days_left_in_trial() }} Days Left in Trial</h2>
-        </div>
-        <div class="text-4xl font-bold text-emerald-400 mb-8">$49/month</div>
-        <p class="text-emerald-100 mb-8">Cancel anytime  No long-term contracts</p>
-        <div class="bg-emerald-500/10 p-6 rounded-lg mb-8">
-            <h3 class="text-xl text-emerald-300 mb-4">What You Keep:</h3>
-            <ul class="text-emerald-100 space-y-2">
-                <li> Real-time options analysis with live market data</li>
-                <li> Advanced options scanner for high-probability trades</li>
-                <li> Portfolio tracking with live P&L calculations</li>
-                <li> Daily trading alerts and opportunities</li>
-                <li> Mobile app access for trading on-the-go</li>
-            </ul>
-        </div>
-        <div>
-            <h3 class="text-xl text-emerald-300 mb-4">Choose Payment Method:</h3>
-            <div class="grid grid-cols-1 md:grid-cols-2 gap-4">
-                <button onclick="checkout('stripe')" class="bg-blue-600 text-white py-4 px-6 rounded-lg font-bold hover:bg-blue-700"> Pay with Card</button>
-                <button onclick="alert('PayPal payment demo')" class="bg-blue-800 text-white py-4 px-6 rounded-lg font-bold hover:bg-blue-900"> PayPal</button>
-            </div>
-            <p class="text-emerald-100 mt-4 text-sm"> Secure payment processing</p>
-        </div>
-        <p class="mt-6"><a href="/dashboard" class="text-emerald-300 hover:underline"> Continue Trial ({{ user.days_left_in_trial() }} days left)</a></p>
-        <script>
-            const stripe = Stripe('{{ stripe_public_key }}');
-            function checkout(method) {
-                if (method === 'stripe') {
-                    fetch('/create-checkout-session', { method: 'POST' })
-                        .then(response => response.json())
-                        .then(session => stripe.redirectToCheckout({ sessionId: session.id }))
-                        .catch(error => alert('Error: ' + error));
-                }
-            }
-        </script>
-    </div>
-</body></html>
-"""
-market_data_html = """
-<!DOCTYPE html>
-<html><head><title>Market Data - ShadowStrike Options</title>
-<script src="https://cdn.tailwindcss.com"></script>
-</head>
-<body class="bg-gradient-to-br from-gray-900 to-emerald-900 text-white font-sans">
-    <div class="max-w-5xl mx-auto p-6">
-        <h1 class="text-3xl font-bold text-emerald-400 mb-6"> Live Market Data</h1>
-        <p>Market Status: <strong>{{ market_status.status }}</strong></p>
-        <p>Next Open: {{ market_status.next_open }}</p>
-        <h2 class="text-xl font-semibold text-emerald-300 mt-6 mb-4">Top Market Movers</h2>
-        <div class="overflow-x-auto">
-            <table class="w-full border-collapse">
-                <thead>
-                    <tr class="bg-emerald-500/30">
-                        <th class="p-3 text-left">Symbol</th>
-                        <th class="p-3 text-left">Price</th>
-                        <th class="p-3 text-left">Change</th>
-                        <th class="p-3 text-left">% Change</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {% for mover in top_movers %}
-                    <tr class="bg-gray-800/30">
-                        <td class="p-3">{{ mover.symbol }}</td>
-                        <td class="p-3">${{ mover.price|round(2) }}</td>
-                        <td class="p-3 {{ 'text-emerald-400' if mover.change >= 0 else 'text-red-400' }}">{{ mover.change|round(2) }}</td>
-                        <td class="p-3 {{ 'text-emerald-400' if mover.change_percent >= 0 else 'text-red-400' }}">{{ mover.change_percent|round(2) }}%</td>
-                    </tr>
-                    {% endfor %}
-                </tbody>
-            </table>
-        </div>
-        <p class="mt-6">
-            <a href="/" class="text-emerald-300 hover:underline">Home</a> | 
-            <a href="/login" class="text-emerald-300 hover:underline">Login</a>
-        </p>
-    </div>
-</body></html>
-"""
-mobile_demo_html = """
-<!DOCTYPE html>
-<html><head><title>Mobile Demo - ShadowStrike Options</title>
-<script src="https://cdn.tailwindcss.com"></script>
-</head>
-<body class="bg-gradient-to-br from-gray-900 to-emerald-900 text-white font-sans flex items-center justify-center min-h-screen">
-    <div class="max-w-md mx-auto bg-gray-800/50 p-8 rounded-2xl shadow-2xl text-center">
-        <h1 class="text-3xl font-bold text-emerald-400 mb-6"> ShadowStrike Mobile Demo</h1>
-        <p class="text-emerald-100 mb-6">Experience our mobile app with the same powerful features!</p>
-        <div class="bg-emerald-500/10 p-6 rounded-lg mb-6">
-            <p class="text-emerald-100">Download the ShadowStrike app for iOS or Android to trade on-the-go.</p>
-            <p class="text-emerald-100 mt-4">Full app coming soon!</p>
-        </div>
-        <a href="/login" class="block bg-emerald-500 text-white py-3 px-6 rounded-lg font-bold hover:bg-emerald-600">Back to Login</a>
-    </div>
-</body></html>
-"""
-os.makedirs("templates", exist_ok=True)
-for name, content in [
-    ("welcome.html", welcome_html),
-    ("login.html", login_html),
-    ("register.html", register_html),
-    ("reset_password.html", reset_password_html),
-    ("dashboard.html", dashboard_html),
-    ("subscribe.html", subscribe_html),
-    ("market_data.html", market_data_html),
-    ("mobile_demo.html", mobile_demo_html)
-]:
-    with open(f"templates/{name}", "w") as f:
-        f.write(content)
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
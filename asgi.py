@@ -0,0 +1,283 @@
+"""Asynchronous serving mode.
+
+    uvicorn asgi:application --workers 2
+    gunicorn -k uvicorn.workers.UvicornWorker -w 2 asgi:application
+
+The data-heavy routes in ASYNC_ROUTES run as coroutines on the event loop,
+inside ordinary Flask request contexts (hooks, sessions, metrics and
+templates work as usual). Their blocking upstream and database calls go to
+parallel.offload's thread pool, and concurrent requests for the same symbol
+await one shared call. A waiting request costs a coroutine, not a worker,
+so one process holds hundreds of them. /api/stream clients likewise await
+their subscription's events on the loop. Every other route is the unchanged
+WSGI app, run on a thread pool of its own (ASGI_WSGI_THREADS).
+"""
+import io
+import os
+import sys
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Response, request, session, jsonify, render_template
+
+import app as web
+import metrics
+from parallel import offload
+
+logger = logging.getLogger(__name__)
+
+WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", 32))
+_wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+for field, help_ in (("calls", "Blocking calls run for async requests"),
+                     ("coalesced", "Async request awaits that shared another request's call")):
+    metrics.registry.callback(f"shadowstrike_async_{field}_total", help_, (),
+                              lambda field=field: {(): getattr(offload, field)}, type_="counter")
+metrics.registry.callback("shadowstrike_async_in_flight", "Shared calls currently running", (),
+                          lambda: {(): offload.in_flight})
+
+
+def _closing_session(fn, *args):
+    try:
+        return fn(*args)
+    finally:
+        web.db.session.close()
+
+
+async def run_db(fn, *args):
+    # Every database step hands its connection back before the request goes
+    # back to waiting, so hundreds of parked requests cannot drain the pool.
+    # Loaded rows stay usable after close(), which detaches but never expires them.
+    return await offload.run(_closing_session, fn, *args)
+
+
+async def value_trades(trades):
+    open_trades, symbols = web.open_positions(trades)
+    fetched = await offload.map_symbols(web.fetch_position_data, symbols)
+    # Valuation saves P&L to the database, so it runs off the loop as well
+    return await run_db(web.value_fetched_trades, open_trades, fetched)
+
+
+async def scanner():
+    return web.snapshot_response(await offload.shared("rankings", web.rankings.get), "scanner")
+
+
+async def top10():
+    return web.snapshot_response(await offload.shared("rankings", web.rankings.get), "top10")
+
+
+async def portfolio():
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    if request.method == "POST":
+        return await run_db(web.portfolio)
+    trades, next_cursor = await run_db(web.portfolio_page)
+    _, valued, _ = await value_trades(trades)
+    return web.portfolio_response(trades, valued, next_cursor)
+
+
+async def dashboard():
+    user, denied = await run_db(web.dashboard_user)
+    if denied is not None:
+        return denied
+    trades, top_movers = await asyncio.gather(run_db(web.user_open_trades, session["user_id"]),
+                                              offload.shared("top_movers", web.get_top_movers))
+    open_trades, valued, spots = await value_trades(trades)
+    return web.render_dashboard(user, open_trades, valued, spots, web.get_market_status(), top_movers)
+
+
+async def market_data():
+    top_movers = await offload.shared("top_movers", web.get_top_movers)
+    return render_template("market_data.html", market_status=web.get_market_status(), top_movers=top_movers)
+
+
+# path: (view, methods); HEAD is served wherever GET is
+ASYNC_ROUTES = {
+    "/api/scanner": (scanner, {"GET"}),
+    "/api/top10": (top10, {"GET"}),
+    "/api/portfolio": (portfolio, {"GET", "POST"}),
+    "/dashboard": (dashboard, {"GET"}),
+    "/market-data": (market_data, {"GET"}),
+}
+
+
+def wsgi_environ(scope, body):
+    root_path = scope.get("root_path", "")
+    path = scope["path"][len(root_path):] if scope["path"].startswith(root_path) else scope["path"]
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode("utf-8").decode("latin-1"),
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", ()):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # The body is read in full up front, so chunked uploads get a length too
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _start(send, status, headers):
+    await send({"type": "http.response.start", "status": int(status.split(" ", 1)[0]),
+                "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]})
+
+
+async def _dispatch(view, environ, send):
+    # Flask's full_dispatch_request, awaiting the view instead of calling it
+    flask_app = web.app
+    with flask_app.request_context(environ):
+        try:
+            try:
+                rv = flask_app.preprocess_request()
+                if rv is None:
+                    rv = await view()
+            except Exception as e:
+                rv = flask_app.handle_user_exception(e)
+            response = flask_app.finalize_request(rv)
+        except Exception as e:
+            response = flask_app.handle_exception(e)
+        app_iter, status, headers = response.get_wsgi_response(environ)
+        body = b"".join(app_iter)
+    await _start(send, status, headers)
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _serve_stream(environ, receive, send):
+    # /api/stream as a coroutine: a client waiting for its next event holds no thread
+    flask_app = web.app
+    subscription = None
+    try:
+        with flask_app.request_context(environ):
+            try:
+                try:
+                    rv = flask_app.preprocess_request()
+                    if rv is None:
+                        subscription = web.stream_subscribe(asyncio.get_running_loop())
+                        # An iterator body, so no Content-Length is added; the events follow below
+                        rv = Response(iter(()), mimetype="text/event-stream", headers=web.STREAM_HEADERS)
+                except Exception as e:
+                    rv = flask_app.handle_user_exception(e)
+                response = flask_app.finalize_request(rv)
+            except Exception as e:
+                response = flask_app.handle_exception(e)
+            app_iter, status, headers = response.get_wsgi_response(environ)
+            body = b"".join(app_iter)
+        await _start(send, status, headers)
+        if subscription is None or not status.startswith("200"):
+            await send({"type": "http.response.body", "body": body})
+            return
+        await _send_events(subscription, receive, send)
+    finally:
+        if subscription is not None:
+            web.market_stream.unsubscribe(subscription)
+
+
+async def _send_events(subscription, receive, send):
+    stream = web.market_stream
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        # The first snapshot may wait on the initial fetch
+        event = "retry: 5000\n" + await offload.run(stream.snapshot_event, subscription)
+        while not disconnected.done():
+            await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+            waiting = asyncio.ensure_future(stream.next_event_async(subscription, web.STREAM_HEARTBEAT_SECONDS))
+            await asyncio.wait({waiting, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not waiting.done():
+                waiting.cancel()
+                break
+            event = waiting.result() or ": keepalive\n\n"
+    finally:
+        disconnected.cancel()
+
+
+async def _serve_wsgi(environ, receive, send):
+    # The WSGI app on its own threads, streaming its body
+    loop = asyncio.get_running_loop()
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [status, headers]
+
+    iterable = await loop.run_in_executor(_wsgi_executor, web.app, environ, start_response)
+    chunks = iter(iterable)
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await _start(send, *started)
+        while not disconnected.done():
+            chunk = await loop.run_in_executor(_wsgi_executor, next, chunks, None)
+            if chunk is None:
+                break
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        disconnected.cancel()
+        if hasattr(iterable, "close"):
+            await loop.run_in_executor(_wsgi_executor, iterable.close)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                await offload.run(web.start_services)
+            except Exception as e:
+                logger.error(f"Startup failed: {e}")
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+    body = await _read_body(receive)
+    if body is None:
+        return
+    environ = wsgi_environ(scope, body)
+    view, methods = ASYNC_ROUTES.get(environ["PATH_INFO"], (None, ()))
+    method = "GET" if environ["REQUEST_METHOD"] == "HEAD" else environ["REQUEST_METHOD"]
+    if environ["PATH_INFO"] == "/api/stream" and environ["REQUEST_METHOD"] == "GET":
+        await _serve_stream(environ, receive, send)
+    elif view is not None and method in methods:
+        await _dispatch(view, environ, send)
+    else:
+        await _serve_wsgi(environ, receive, send)
@@ -0,0 +1,240 @@
+"""Historical backtests of the analyze_stock signal rules.
+
+    python backtest.py --symbols SPY,QQQ,AAPL --period 5y --structure spread --processes 8
+    python backtest.py --symbols-file sp500.txt --provider synthetic --output report.json
+
+Each symbol's daily bars are replayed through the same indicators and rules
+that analyze_stock uses, and every signal is traded as the option or debit
+spread it implies. Histories load on a thread pool while earlier batches are
+evaluated on a process pool.
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from indicators import indicator_frame
+from parallel import map_symbols, process_pool
+from pricing import price_options
+from signals import RULES
+
+logger = logging.getLogger(__name__)
+
+# How signals are traded. "option" buys an at-the-money call (bullish) or put
+# (bearish) expiring in expiry_days; "spread" also sells the same type `width`
+# (a fraction of spot) further out of the money. Positions are closed after
+# hold_bars bars, or at expiry if sooner. Option prices are Black-Scholes at
+# the 30-day realized volatility, since historical chains are not available.
+# fee is charged per contract per leg on entry and on exit.
+TradePlan = namedtuple("TradePlan", ["structure", "expiry_days", "hold_bars", "width", "rate", "fee"])
+DEFAULT_PLAN = TradePlan(structure="option", expiry_days=30, hold_bars=10, width=0.05, rate=0.05, fee=0.65)
+TRADING_DAYS = 252
+BATCH_SIZE = 50
+TRADE_COLUMNS = ["symbol", "signal", "direction", "entry_date", "exit_date", "entry_spot", "exit_spot",
+                 "strike", "short_strike", "entry_iv", "entry_cost", "exit_value", "pnl"]
+
+
+def signal_frame(values):
+    # One bool column per rule for every bar of an indicator_frame
+    previous = values.shift(1)
+    return pd.DataFrame({name: np.asarray(rule(values, previous), dtype=bool) for name, (_, rule) in RULES.items()},
+                        index=values.index)
+
+
+def _leg_prices(spot, strike, T, plan, iv, is_call):
+    return price_options(spot, strike, T, plan.rate, iv, is_call)["price"]
+
+
+def backtest_symbol(symbol, df, plan=DEFAULT_PLAN):
+    """Every trade the signal rules would have opened on one symbol's daily bars."""
+    values = indicator_frame(df)
+    fired = signal_frame(values)
+    n = len(df)
+    hold = plan.hold_bars
+    names, directions, entries = [], [], []
+    for name, (direction, _) in RULES.items():
+        rows = np.flatnonzero(fired[name].to_numpy()[:max(n - hold, 0)])
+        names.append(np.full(len(rows), name, dtype=object))
+        directions.append(np.full(len(rows), direction))
+        entries.append(rows)
+    entry = np.concatenate(entries).astype(np.intp)
+    exit_ = entry + hold
+    close = values["Close"].to_numpy()
+    iv = values["Volatility"].to_numpy() / 100 * np.sqrt(TRADING_DAYS)
+    usable = np.isfinite(iv[entry]) & (iv[entry] > 0)
+    entry, exit_ = entry[usable], exit_[usable]
+    signal, direction = np.concatenate(names)[usable], np.concatenate(directions)[usable]
+    if not len(entry):
+        return pd.DataFrame(columns=TRADE_COLUMNS)
+
+    dates = df.index
+    elapsed = np.asarray((dates[exit_] - dates[entry]).days, dtype=float)
+    T0 = plan.expiry_days / 365
+    T1 = np.maximum(plan.expiry_days - elapsed, 0) / 365
+    # Marked at the exit bar's realized volatility when it is known
+    exit_iv = np.where(np.isfinite(iv[exit_]) & (iv[exit_] > 0), iv[exit_], iv[entry])
+    is_call = direction > 0
+    S0, S1 = close[entry], close[exit_]
+    strike = S0
+    cost = _leg_prices(S0, strike, T0, plan, iv[entry], is_call)
+    value = _leg_prices(S1, strike, T1, plan, exit_iv, is_call)
+    legs = 1
+    short_strike = np.full(len(entry), np.nan)
+    if plan.structure == "spread":
+        short_strike = S0 * (1 + direction * plan.width)
+        cost = cost - _leg_prices(S0, short_strike, T0, plan, iv[entry], is_call)
+        value = value - _leg_prices(S1, short_strike, T1, plan, exit_iv, is_call)
+        legs = 2
+    elif plan.structure != "option":
+        raise ValueError(f"Unknown trade structure: {plan.structure}")
+
+    trades = pd.DataFrame({
+        "symbol": symbol,
+        "signal": signal,
+        "direction": direction,
+        "entry_date": dates[entry],
+        "exit_date": dates[exit_],
+        "entry_spot": S0,
+        "exit_spot": S1,
+        "strike": strike,
+        "short_strike": short_strike,
+        "entry_iv": iv[entry],
+        "entry_cost": cost,
+        "exit_value": value,
+        "pnl": (value - cost) * 100 - 2 * legs * plan.fee,
+    })
+    return trades.sort_values("entry_date", kind="stable", ignore_index=True)
+
+
+def _max_drawdown(pnl):
+    equity = np.concatenate([[0.0], np.cumsum(pnl)])
+    return float((np.maximum.accumulate(equity) - equity).max())
+
+
+def summarize(trades):
+    """Hit rate, P&L and drawdown per signal and overall ("All").
+
+    Drawdown is the largest drop in cumulative P&L with trades realized in
+    exit-date order, one contract per signal.
+    """
+    rows = []
+    trades = trades.sort_values("exit_date", kind="stable")
+    groups = [(name, group) for name, group in trades.groupby("signal", sort=True)] + [("All", trades)]
+    for name, group in groups:
+        pnl = group["pnl"].to_numpy(dtype=float)
+        rows.append({
+            "signal": name,
+            "trades": len(pnl),
+            "symbols": int(group["symbol"].nunique()),
+            "hit_rate": round(float((pnl > 0).mean()) * 100, 1) if len(pnl) else None,
+            "total_pnl": round(float(pnl.sum()), 2),
+            "avg_pnl": round(float(pnl.mean()), 2) if len(pnl) else None,
+            "max_drawdown": round(_max_drawdown(pnl), 2),
+        })
+    return rows
+
+
+def backtest_universe(symbols, load_history, plan=DEFAULT_PLAN, processes=0, batch_size=BATCH_SIZE):
+    """Backtest every symbol, loading histories on threads and evaluating them on processes.
+
+    load_history(symbol) returns a daily OHLC frame. Returns (trades, failed),
+    where failed maps symbols that could not be loaded or evaluated to the error.
+    """
+    pool = process_pool(processes) if processes > 1 else None
+    pending, frames, failed = [], [], {}
+
+    def collect(done):
+        for symbol, result in done:
+            try:
+                frames.append(result.result() if pool else result)
+            except Exception as e:
+                logger.error(f"Backtest failed for {symbol}: {e}")
+                failed[symbol] = str(e)
+
+    for start in range(0, len(symbols), batch_size):
+        batch = []
+        for symbol, df, error in map_symbols(load_history, symbols[start:start + batch_size],
+                                             timeout=60 * batch_size):
+            if error or df is None or df.empty:
+                failed[symbol] = error or "no data"
+                continue
+            # Workers get plain frames, not read-only memory-mapped history
+            df = pd.DataFrame(df[["Open", "High", "Low", "Close", "Volume"]].to_numpy(), index=df.index,
+                              columns=["Open", "High", "Low", "Close", "Volume"])
+            if pool:
+                batch.append((symbol, pool.submit(backtest_symbol, symbol, df, plan)))
+            else:
+                try:
+                    batch.append((symbol, backtest_symbol(symbol, df, plan)))
+                except Exception as e:
+                    logger.error(f"Backtest failed for {symbol}: {e}")
+                    failed[symbol] = str(e)
+        # The next batch downloads while this one is evaluated
+        collect(pending)
+        pending = batch
+    collect(pending)
+    trades = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=TRADE_COLUMNS)
+    return trades, failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbols", default="SPY,QQQ,GLD,SLV", help="comma-separated symbols")
+    parser.add_argument("--symbols-file", default=None, help="file with one symbol per line")
+    parser.add_argument("--provider", default="yfinance", help='"yfinance", "synthetic[:seed]" or "fixtures:<dir>"')
+    parser.add_argument("--history-dir", default=os.environ.get("HISTORY_DIR", "data/history"))
+    parser.add_argument("--period", default="5y")
+    parser.add_argument("--structure", choices=("option", "spread"), default=DEFAULT_PLAN.structure)
+    parser.add_argument("--expiry-days", type=int, default=DEFAULT_PLAN.expiry_days)
+    parser.add_argument("--hold-bars", type=int, default=DEFAULT_PLAN.hold_bars)
+    parser.add_argument("--width", type=float, default=DEFAULT_PLAN.width)
+    parser.add_argument("--rate", type=float, default=5.0, help="upstream history requests per second")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--trades", default=None, help="also write every trade to this CSV")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    return parser.parse_args()
+
+
+def main():
+    from providers import make_provider
+    from history_store import HistoryStore
+    from gateway import MarketDataGateway
+
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    if args.symbols_file:
+        with open(args.symbols_file) as f:
+            symbols = [line.strip().upper() for line in f if line.strip() and not line.startswith("#")]
+    else:
+        symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    provider = make_provider(args.provider)
+    gateway = MarketDataGateway(provider.name, rate=args.rate)
+
+    def fetch(symbol, interval, period=None, start=None):
+        return gateway.call((symbol, interval, period, start),
+                            lambda: provider.history(symbol, interval, period=period, start=start))
+
+    store = HistoryStore(args.history_dir, fetch)
+    plan = DEFAULT_PLAN._replace(structure=args.structure, expiry_days=args.expiry_days,
+                                 hold_bars=args.hold_bars, width=args.width)
+    trades, failed = backtest_universe(symbols, lambda symbol: store.get(symbol, "1d", args.period), plan,
+                                       processes=args.processes)
+    if args.trades:
+        trades.to_csv(args.trades, index=False)
+    report = {"plan": plan._asdict(), "period": args.period, "symbols": len(symbols), "failed": failed,
+              "results": summarize(trades)}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""Compare two benchmark runs and flag regressions.
+
+    python benchmarks/compare.py before.json after.json --metric p50_ms --threshold 10
+"""
+import sys
+import json
+import argparse
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report["meta"], {(r["kind"], r["name"]): r for r in report["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--metric", default="p50_ms")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slowdown counted as a regression")
+    args = parser.parse_args()
+
+    before_meta, before = load(args.before)
+    after_meta, after = load(args.after)
+    print(f"{(before_meta.get('commit') or '?')[:10]} -> {(after_meta.get('commit') or '?')[:10]} ({args.metric})")
+    regressions = 0
+    for key in sorted(before.keys() | after.keys()):
+        old, new = before.get(key, {}).get(args.metric), after.get(key, {}).get(args.metric)
+        label = f"{key[0]:8} {key[1]:40}"
+        if old is None or new is None:
+            print(f"{label} {'only in ' + ('after' if old is None else 'before'):>28}")
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{label} {old:12.3f} {new:12.3f} {change:+8.1f}%{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import gc
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def measure(name, kind, fn, iterations=50, warmup=3, setup=None, items=1):
+    """Time fn() and return a JSON-ready result.
+
+    setup() runs before every call and is excluded from the timings. items is
+    the number of units (symbols, contracts) one call processes, for
+    throughput. Allocations come from a separate traced call, since
+    tracemalloc itself slows the code under test.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    gc.collect()
+    timings = np.empty(iterations)
+    for i in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    ms = timings * 1000
+    mean = float(timings.mean())
+    return {
+        "name": name,
+        "kind": kind,
+        "iterations": iterations,
+        "items": items,
+        "mean_ms": round(float(ms.mean()), 4),
+        "min_ms": round(float(ms.min()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p90_ms": round(float(np.percentile(ms, 90)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "max_ms": round(float(ms.max()), 4),
+        "ops_per_sec": round(1 / mean, 2) if mean else None,
+        "items_per_sec": round(items / mean, 2) if mean else None,
+        "alloc_peak_kb": round((peak - before) / 1024, 1),
+        "alloc_retained_kb": round((current - before) / 1024, 1),
+    }
@@ -0,0 +1,95 @@
+"""Check that importing app stays cheap and free of heavy modules.
+
+Imports app in fresh interpreters, reports the median wall time and the
+slowest imports, and exits non-zero if the median exceeds the budget or a
+deferred module (pandas, yfinance, stripe, ...) was loaded at import:
+
+    python benchmarks/import_budget.py --budget 1.0 --runs 5
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Loaded on first use by the routes and jobs that need them
+DEFERRED_MODULES = ["pandas", "numpy", "scipy", "yfinance", "stripe", "firebase_admin", "requests",
+                    "chains", "pricing", "indicators", "history_store", "valuation", "spreads", "providers",
+                    "scenarios", "backtest"]
+PROBE = (
+    "import sys, time, json\n"
+    "start = time.perf_counter()\n"
+    "import app\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(json.dumps({'seconds': elapsed, 'modules': sorted(sys.modules)}))\n"
+)
+
+
+def run_probe(importtime=False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", PROBE]
+    proc = subprocess.run(cmd, cwd=REPO, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def slowest_imports(importtime_log, limit):
+    # "import time: self [us] | cumulative | name", indented two spaces per level;
+    # only the modules app imports directly are reported
+    rows = []
+    for line in importtime_log.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        if len(name) - len(name.lstrip()) != 3:
+            continue
+        rows.append((int(parts[1]) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=float(os.environ.get("IMPORT_BUDGET_SECONDS", 1.0)),
+                        help="maximum median import time in seconds")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    # One untimed run so bytecode compilation does not count against the budget
+    run_probe()
+    timings = [run_probe()[0]["seconds"] for _ in range(args.runs)]
+    probe, log = run_probe(importtime=True)
+    loaded = [name for name in DEFERRED_MODULES if name in probe["modules"]]
+    median = statistics.median(timings)
+
+    report = {
+        "median_seconds": round(median, 4),
+        "min_seconds": round(min(timings), 4),
+        "max_seconds": round(max(timings), 4),
+        "budget_seconds": args.budget,
+        "deferred_modules_loaded": loaded,
+        "slowest_imports": [{"module": name, "seconds": round(seconds, 4)}
+                            for seconds, name in slowest_imports(log, args.top)],
+    }
+    print(f"import app: median {median:.3f}s (min {min(timings):.3f}s, max {max(timings):.3f}s), "
+          f"budget {args.budget:.3f}s")
+    for row in report["slowest_imports"]:
+        print(f"  {row['seconds']:8.3f}s  {row['module']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = False
+    if loaded:
+        print(f"FAIL: deferred modules imported at startup: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print(f"FAIL: import time {median:.3f}s is over the {args.budget:.3f}s budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+"""Record yfinance history and option chains as fixtures for offline benchmark runs.
+
+    python benchmarks/record.py --out benchmarks/fixtures SPY QQQ GLD SLV
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from providers import YFinanceProvider, record_fixtures  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "fixtures"))
+    parser.add_argument("--intervals", default="1d", help="comma-separated bar intervals")
+    parser.add_argument("--period", default="2y")
+    args = parser.parse_args()
+    recorded = record_fixtures(YFinanceProvider(), args.symbols, args.out,
+                               intervals=args.intervals.split(","), period=args.period)
+    print(f"Recorded {len(recorded)}/{len(args.symbols)} symbols to {args.out}")
+    return 0 if recorded else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
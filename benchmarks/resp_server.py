@@ -0,0 +1,107 @@
+"""Minimal in-memory server speaking the Redis protocol, for offline runs.
+
+    python benchmarks/resp_server.py --port 6399
+    MARKET_CACHE_BACKEND=redis://127.0.0.1:6399/0 gunicorn -w 4 app:app
+
+Implements only what cache_backends.RedisBackend sends (PING, GET, SET with
+EX/PX/NX, DEL, SELECT, AUTH, FLUSHDB), with every database sharing one
+keyspace. Not for production use.
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import socketserver
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_backends import _read_reply  # noqa: E402
+
+
+class Store:
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or (entry[0] is not None and entry[0] <= time.monotonic()):
+            self.entries.pop(key, None)
+            return None
+        return entry[1]
+
+
+def _bulk(value):
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def execute(store, command):
+    name = command[0].upper()
+    args = command[1:]
+    with store.lock:
+        if name in (b"PING", b"SELECT", b"AUTH"):
+            return b"+PONG\r\n" if name == b"PING" else b"+OK\r\n"
+        if name == b"GET":
+            return _bulk(store.get(args[0]))
+        if name == b"SET":
+            key, value, expires_at, only_new = args[0], args[1], None, False
+            options = [arg.upper() for arg in args[2:]]
+            for i, option in enumerate(options):
+                if option in (b"PX", b"EX"):
+                    seconds = int(args[2 + i + 1]) / (1000 if option == b"PX" else 1)
+                    expires_at = time.monotonic() + seconds
+                elif option == b"NX":
+                    only_new = True
+            if only_new and store.get(key) is not None:
+                return b"$-1\r\n"
+            store.entries[key] = (expires_at, value)
+            return b"+OK\r\n"
+        if name == b"DEL":
+            removed = sum(store.get(key) is not None and store.entries.pop(key, None) is not None for key in args)
+            return b":%d\r\n" % removed
+        if name == b"FLUSHDB":
+            store.entries.clear()
+            return b"+OK\r\n"
+    return b"-ERR unknown command '%s'\r\n" % name
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def serve(host="127.0.0.1", port=0):
+    """Start a server on a daemon thread; returns it (its port is server.server_address[1])."""
+    store = Store()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            while True:
+                try:
+                    command = _read_reply(self.rfile)
+                except (ConnectionError, OSError):
+                    return
+                self.wfile.write(execute(store, command))
+
+    server = _Server((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="resp-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6399)
+    args = parser.parse_args()
+    server = serve(args.host, args.port)
+    print(f"Listening on redis://{args.host}:{server.server_address[1]}/0", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""Offline benchmarks for the market-data, pricing and API hot paths.
+
+Replays recorded fixtures (benchmarks/record.py) or generated data through the
+app's market data provider, so no network is needed:
+
+    python benchmarks/run.py --provider fixtures:benchmarks/fixtures --output before.json
+    python benchmarks/run.py --provider synthetic --symbols 200 --cold
+
+Writes a JSON report with per-function and per-endpoint latency percentiles,
+throughput and allocations; compare two reports with benchmarks/compare.py.
+"""
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from itertools import cycle
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import measure  # noqa: E402
+
+TRADES_PER_SYMBOL = 5
+SCENARIO_PATHS = 2000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    default_fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+    parser.add_argument("--provider", default=f"fixtures:{default_fixtures}" if os.path.isdir(default_fixtures) else "synthetic",
+                        help='"synthetic[:seed]" or "fixtures:<dir>"')
+    parser.add_argument("--symbols", type=int, default=4, help="number of symbols to scan")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--cold", action="store_true", help="clear in-process caches before every call")
+    parser.add_argument("--cache-backend", default="",
+                        help='shared cache tier (see cache_backends.make_backend), or "resp" for a local stand-in '
+                             'Redis server; --cold then leaves the shared tier warm, as a fresh worker would find it')
+    parser.add_argument("--only", default=None, help="run benchmarks whose name contains this string")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    return parser.parse_args()
+
+
+def universe(provider, count):
+    # Recorded symbols are replayed under aliases ("SPY~3") to reach the requested count
+    from providers import FixtureProvider
+    base = provider.symbols() if isinstance(provider, FixtureProvider) else ["SYN"]
+    if not base:
+        raise SystemExit("No fixtures recorded; run benchmarks/record.py first")
+    return [base[i % len(base)] if i < len(base) else f"{base[i % len(base)]}~{i}" for i in range(count)]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def import_app(provider_spec, workdir, cache_backend=""):
+    os.environ.update({
+        "MARKET_CACHE_BACKEND": cache_backend,
+        "MARKET_DATA_PROVIDER": provider_spec,
+        "RANKINGS_BACKGROUND_REFRESH": "0",
+        "SCHEDULER_ENABLED": "0",
+        "HISTORY_DIR": os.path.join(workdir, "history"),
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        # Offline providers need no upstream rate limit
+        "MARKET_DATA_RATE": "1000000",
+        "MARKET_DATA_BURST": "1000000",
+    })
+    import app
+    logging.disable(logging.WARNING)
+    return app
+
+
+def benchmarks(app, symbols, cold):
+    import indicators
+    from spreads import search_verticals
+    from scenarios import simulate_chain
+    from pricing import solve_chain_iv
+    from backtest import backtest_symbol
+    from frame_codec import encode_frame, decode_frame
+
+    def clear_caches():
+        app.stock_data_cache.invalidate()
+        app.options_cache.invalidate()
+        indicators.indicator_store = indicators.IndicatorStore()
+
+    setup = clear_caches if cold else None
+    next_symbol = cycle(symbols).__next__
+    index = app.fetch_chain_index(symbols[0])
+    chain = index.chain
+    spot = app.analyze_stock(symbols[0])["details"]["Price"]
+    contract = chain.iloc[len(chain) // 2]
+    history = app.fetch_stock_data(symbols[0], period="5y")
+    encoded_chain = encode_frame(chain)
+
+    with app.app.app_context():
+        app.db.create_all()
+        app.db.session.add_all([app.Trade(
+            user_id="bench", symbol=symbol, option_type=row["type"], strike_price=row["strike"],
+            expiration=row["expiration"], entry_price=row["price"], quantity=1
+        ) for symbol in symbols for _, row in app.fetch_option_chain(symbol).head(TRADES_PER_SYMBOL).iterrows()])
+        app.db.session.commit()
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = "bench"
+
+    def get(path):
+        return lambda: client.get(path).get_data()
+
+    def post(path, payload):
+        return lambda: client.post(path, json=payload).get_data()
+
+    def value_trades():
+        with app.app.app_context():
+            app.value_open_trades(app.Trade.query.filter_by(user_id="bench").all())
+
+    return [
+        ("function", "analyze_stock", lambda: app.analyze_stock(next_symbol()), 1),
+        ("function", "fetch_options_data", lambda: app.fetch_options_data(next_symbol()), 1),
+        ("function", "black_scholes", lambda: app.black_scholes(spot, float(contract["strike"]), 30 / 365,
+                                                              app.RISK_FREE_RATE, 0.25, "CALL"), 1),
+        ("function", "score_options", lambda: app.score_options(chain, spot), len(chain)),
+        ("function", "search_verticals", lambda: search_verticals(index, spot, app.RISK_FREE_RATE,
+                                                                     score=app.SPREAD_SCORE), len(chain)),
+        ("function", "solve_chain_iv", lambda: solve_chain_iv(chain, spot, app.RISK_FREE_RATE), len(chain)),
+        ("function", "simulate_chain", lambda: simulate_chain(index, spot, app.RISK_FREE_RATE, paths=SCENARIO_PATHS),
+         len(chain)),
+        ("function", "backtest_symbol", lambda: backtest_symbol(symbols[0], history), len(history)),
+        ("function", "encode_chain", lambda: encode_frame(chain), len(chain)),
+        ("function", "decode_chain", lambda: decode_frame(encoded_chain), len(chain)),
+        ("function", "compute_rankings", app.compute_rankings, len(symbols)),
+        ("function", "value_open_trades", value_trades, len(symbols) * TRADES_PER_SYMBOL),
+        ("endpoint", "GET /api/scanner", get("/api/scanner"), 1),
+        ("endpoint", "GET /api/top10", get("/api/top10"), 1),
+        ("endpoint", "GET /api/portfolio", get("/api/portfolio"), len(symbols) * TRADES_PER_SYMBOL),
+        ("endpoint", "POST /api/trade-scenario", post("/api/trade-scenario", {
+            "symbol": symbols[0], "paths": SCENARIO_PATHS}), len(chain)),
+    ], setup
+
+
+def main():
+    args = parse_args()
+    if args.provider.startswith("fixtures:"):
+        args.provider = "fixtures:" + os.path.abspath(args.provider.partition(":")[2])
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = tempfile.mkdtemp(prefix="shadowstrike-bench-")
+    try:
+        if args.cache_backend == "resp":
+            from resp_server import serve
+            args.cache_backend = f"redis://127.0.0.1:{serve().server_address[1]}/0"
+        elif args.cache_backend.startswith("sqlite") and ":" not in args.cache_backend:
+            args.cache_backend = f"sqlite:{os.path.join(workdir, 'cache.db')}"
+        app = import_app(args.provider, workdir, args.cache_backend)
+        symbols = universe(app.get_market_provider(), args.symbols)
+        app.SCANNER_SYMBOLS = symbols
+        cases, setup = benchmarks(app, symbols, args.cold)
+        results = []
+        for kind, name, fn, items in cases:
+            if args.only and args.only not in name:
+                continue
+            results.append(measure(name, kind, fn, iterations=args.iterations, warmup=args.warmup,
+                                   setup=setup, items=items))
+            print(f"{kind:8} {name:28} p50 {results[-1]['p50_ms']:10.3f} ms  p99 {results[-1]['p99_ms']:10.3f} ms",
+                  file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "generated_at": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "provider": args.provider,
+            "symbols": len(symbols),
+            "cold": args.cold,
+            "cache_backend": args.cache_backend or None,
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
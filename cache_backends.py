@@ -0,0 +1,236 @@
+import time
+import queue
+import socket
+import sqlite3
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+# Every backend stores bytes under string keys with a TTL in seconds:
+#   get(key) -> bytes or None, set(key, value, ttl), add(key, value, ttl) -> True
+#   if the key was absent (an atomic set-if-absent, used as a lock), delete(key)
+
+
+class MemoryBackend:
+    """In-process LRU of encoded values; shares nothing, but exercises the same path."""
+
+    name = "memory"
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def add(self, key, value, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                return False
+            self._entries[key] = (time.time() + ttl, value)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteBackend:
+    """Store shared by every worker process on one host, in one SQLite file.
+
+    Connections are opened per thread on first use, in WAL mode so readers
+    never wait on a writer. Expired rows are purged every `purge_every` writes.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, purge_every=200):
+        self.path = path
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._writes = 0
+
+    def get(self, key):
+        row = self._conn().execute("SELECT value FROM entries WHERE key = ? AND expires_at > ?",
+                                   (key, time.time())).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def set(self, key, value, ttl):
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, value, time.time() + ttl))
+        self._wrote(conn)
+
+    def add(self, key, value, ttl):
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute("DELETE FROM entries WHERE key = ? AND expires_at <= ?", (key, now))
+            added = conn.execute("INSERT OR IGNORE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                                 (key, value, now + ttl)).rowcount == 1
+        return added
+
+    def delete(self, key):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _wrote(self, conn):
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            with conn:
+                conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.isolation_level = ""
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries "
+                         "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend:
+    """Store on any server speaking the Redis protocol (RESP2), over pooled plain sockets.
+
+    Only GET, SET (PX, NX) and DEL are used, so Redis, Valkey, KeyDB or a
+    local stand-in such as benchmarks/resp_server.py can serve it.
+    """
+
+    name = "redis"
+
+    def __init__(self, host="localhost", port=6379, db=0, password=None, timeout=2.0, pool_size=8):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(pool_size)
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(parsed.hostname or "localhost", parsed.port or 6379, db, parsed.password, **kwargs)
+
+    def get(self, key):
+        return self.execute("GET", key)
+
+    def set(self, key, value, ttl):
+        self.execute("SET", key, value, "PX", max(int(ttl * 1000), 1))
+
+    def add(self, key, value, ttl):
+        return self.execute("SET", key, value, "PX", max(int(ttl * 1000), 1), "NX") is not None
+
+    def delete(self, key):
+        self.execute("DEL", key)
+
+    def execute(self, *args):
+        sock, reader = self._checkout()
+        try:
+            sock.sendall(_encode_command(args))
+            reply = _read_reply(reader)
+        except Exception:
+            sock.close()
+            raise
+        try:
+            self._pool.put_nowait((sock, reader))
+        except queue.Full:
+            sock.close()
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
+
+    def _checkout(self):
+        # A pooled (socket, reader) pair, or a new authenticated connection
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        reader = sock.makefile("rb")
+        setup = ([("AUTH", self.password)] if self.password else []) + ([("SELECT", self.db)] if self.db else [])
+        try:
+            for command in setup:
+                sock.sendall(_encode_command(command))
+                reply = _read_reply(reader)
+                if isinstance(reply, RedisError):
+                    raise reply
+        except Exception:
+            sock.close()
+            raise
+        return sock, reader
+
+
+def _encode_command(args):
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def _read_reply(reader):
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed by cache server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        return RedisError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(rest)
+        return None if count < 0 else [_read_reply(reader) for _ in range(count)]
+    raise RedisError(f"Unexpected reply: {line!r}")
+
+
+def make_backend(spec):
+    """Build a backend from "memory[:maxsize]", "sqlite:<path>" or "redis://host:port/db"; "" means none."""
+    if not spec or spec == "none":
+        return None
+    if spec.startswith(("redis://", "rediss://")):
+        if spec.startswith("rediss://"):
+            raise ValueError("TLS Redis connections are not supported")
+        return RedisBackend.from_url(spec)
+    kind, _, arg = spec.partition(":")
+    if kind == "memory":
+        return MemoryBackend(int(arg or 1024))
+    if kind == "sqlite":
+        return SQLiteBackend(arg or "data/market_cache.db")
+    raise ValueError(f"Unknown cache backend: {spec}")
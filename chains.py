@@ -0,0 +1,123 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Column order of the normalized chain; also the key order of the JSON records
+CHAIN_COLUMNS = ["type", "strike", "expiration", "price", "bid", "ask", "volume",
+                 "openInterest", "impliedVolatility", "daysToExpiry"]
+DEFAULT_IV = 20.0
+
+
+def empty_chain():
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in [
+        ("type", "object"), ("strike", "float64"), ("expiration", "object"),
+        ("price", "float64"), ("bid", "float64"), ("ask", "float64"),
+        ("volume", "int64"), ("openInterest", "int64"),
+        ("impliedVolatility", "float64"), ("daysToExpiry", "int64"),
+    ]})
+
+
+def normalize_chain(raw_chains, now=None):
+    """Build one columnar chain from yfinance (expiration, calls, puts) tuples."""
+    now = now or datetime.now()
+    parts = []
+    for exp, calls, puts in raw_chains:
+        # Days to expiry is computed once per expiration, not per row
+        days_to_expiry = (datetime.strptime(exp, "%Y-%m-%d") - now).days
+        for type_, frame in (("CALL", calls), ("PUT", puts)):
+            if frame is None or frame.empty:
+                continue
+            parts.append(pd.DataFrame({
+                "type": type_,
+                "strike": frame["strike"].to_numpy(dtype=float),
+                "expiration": exp,
+                "price": frame["lastPrice"].to_numpy(dtype=float),
+                "bid": frame["bid"].to_numpy(dtype=float),
+                "ask": frame["ask"].to_numpy(dtype=float),
+                "volume": frame["volume"].to_numpy(dtype=float),
+                "openInterest": frame["openInterest"].to_numpy(dtype=float),
+                "impliedVolatility": frame["impliedVolatility"].to_numpy(dtype=float),
+                "daysToExpiry": days_to_expiry,
+            }))
+    if not parts:
+        return empty_chain()
+    chain = pd.concat(parts, ignore_index=True)
+    for col in ("strike", "price", "bid", "ask"):
+        chain[col] = chain[col].round(2)
+    for col in ("volume", "openInterest"):
+        chain[col] = chain[col].fillna(0).astype(np.int64)
+    chain["impliedVolatility"] = (chain["impliedVolatility"] * 100).round(1).fillna(DEFAULT_IV)
+    chain["daysToExpiry"] = chain["daysToExpiry"].astype(np.int64)
+    # Low-cardinality label columns are stored as categoricals
+    chain["type"] = chain["type"].astype("category")
+    chain["expiration"] = chain["expiration"].astype("category")
+    # Stable sort keeps calls ahead of puts at the same expiration and strike
+    chain = chain.sort_values(["expiration", "strike"], kind="mergesort", ignore_index=True)
+    return chain[CHAIN_COLUMNS]
+
+
+def chain_records(chain):
+    # List-of-dicts view for JSON responses and legacy callers
+    return chain.to_dict("records")
+
+
+class ChainIndex:
+    """Lookup index over one chain snapshot by (type, expiration, strike).
+
+    Strikes are matched within a tolerance rather than by float equality.
+    When no expiration is given, the nearest expiration listing the strike wins.
+    """
+
+    def __init__(self, chain, tolerance=0.005):
+        self.chain = chain
+        self.tolerance = tolerance
+        self.expirations = sorted(str(exp) for exp in chain["expiration"].unique())
+        self._groups = {}
+        strikes = chain["strike"].to_numpy(dtype=float)
+        if chain.empty:
+            return
+        for (type_, exp), positions in chain.groupby(["type", "expiration"], observed=True).indices.items():
+            order = np.argsort(strikes[positions], kind="stable")
+            self._groups[(str(type_), str(exp))] = (strikes[positions][order], positions[order])
+
+    def strikes(self, type_, expiration):
+        # Sorted strikes and their row positions for one side of one expiration
+        empty = np.empty(0)
+        return self._groups.get((type_, expiration), (empty, empty.astype(np.intp)))
+
+    def find(self, type_, strike, expiration=None):
+        position = self.lookup([type_], [strike], None if expiration is None else [expiration])[0]
+        return None if position < 0 else self.chain.iloc[position]
+
+    def nearest(self, type_, strike, expiration):
+        strikes, positions = self.strikes(type_, expiration)
+        if not len(strikes):
+            return None
+        i = int(np.searchsorted(strikes, strike))
+        best = min((j for j in (i - 1, i) if 0 <= j < len(strikes)), key=lambda j: abs(strikes[j] - strike))
+        return self.chain.iloc[positions[best]]
+
+    def lookup(self, types, strikes, expirations=None):
+        """Row positions in the chain for many contracts at once; -1 where none matches."""
+        types = np.asarray(types, dtype=object)
+        strikes = np.asarray(strikes, dtype=float)
+        if expirations is None:
+            expirations = np.full(len(types), None, dtype=object)
+        expirations = np.asarray(expirations, dtype=object)
+        result = np.full(len(types), -1, dtype=np.intp)
+        for exp in self.expirations:
+            # Exact expirations first; unknown expirations fall through nearest-first
+            wanted = (result < 0) & ((expirations == exp) | pd.isna(expirations))
+            for type_ in ("CALL", "PUT"):
+                rows = np.flatnonzero(wanted & (types == type_))
+                if not len(rows):
+                    continue
+                group_strikes, positions = self.strikes(type_, exp)
+                if not len(group_strikes):
+                    continue
+                i = np.searchsorted(group_strikes, strikes[rows])
+                for candidate in (np.clip(i, 0, len(group_strikes) - 1), np.clip(i - 1, 0, len(group_strikes) - 1)):
+                    hit = (result[rows] < 0) & (np.abs(group_strikes[candidate] - strikes[rows]) <= self.tolerance)
+                    result[rows[hit]] = positions[candidate[hit]]
+        return result
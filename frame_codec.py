@@ -0,0 +1,112 @@
+import json
+import zlib
+import struct
+
+import numpy as np
+import pandas as pd
+
+# A frame is MAGIC, a little-endian uint32 header length, a JSON header
+# describing the index and columns, then every column's raw little-endian
+# buffer back to back, zlib-compressed. Categorical and string columns are
+# stored as integer codes plus their (string) categories in the header, and
+# integer columns in the narrowest integer type that holds their range.
+MAGIC = b"SSF1"
+COMPRESS_LEVEL = 1
+NARROW_INTS = (np.int8, np.int16, np.int32)
+
+
+def _le(array):
+    return array.astype(array.dtype.newbyteorder("<"), copy=False)
+
+
+def _narrow(values):
+    if values.dtype.kind != "i" or not len(values):
+        return values
+    low, high = values.min(), values.max()
+    for dtype in NARROW_INTS:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+def encode_frame(df):
+    """Pack a DataFrame of numeric, categorical and string columns into bytes."""
+    columns, buffers = [], []
+    for name in df.columns:
+        col = df[name]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            codes = _le(col.cat.codes.to_numpy())
+            columns.append({"name": name, "kind": "category", "dtype": codes.dtype.str,
+                            "categories": [str(c) for c in col.cat.categories]})
+            buffers.append(codes)
+        elif col.dtype == object or pd.api.types.is_string_dtype(col.dtype):
+            categorical = col.astype("category")
+            codes = _le(categorical.cat.codes.to_numpy())
+            columns.append({"name": name, "kind": "string", "dtype": codes.dtype.str, "as": str(col.dtype),
+                            "categories": [str(c) for c in categorical.cat.categories]})
+            buffers.append(codes)
+        elif not isinstance(col.dtype, np.dtype):
+            raise TypeError(f"Cannot encode column {name!r} of dtype {col.dtype}")
+        else:
+            values = _le(col.to_numpy())
+            stored = _le(_narrow(values))
+            columns.append({"name": name, "kind": "array", "dtype": stored.dtype.str, "as": values.dtype.str})
+            buffers.append(stored)
+
+    index = df.index
+    if isinstance(index, pd.RangeIndex):
+        index_header = {"kind": "range", "start": index.start, "step": index.step}
+    elif isinstance(index, pd.DatetimeIndex):
+        utc = index if index.tz is None else index.tz_convert("UTC").tz_localize(None)
+        index_header = {"kind": "datetime", "unit": utc.unit, "tz": str(index.tz) if index.tz is not None else None}
+        buffers.append(_le(utc.asi8))
+    else:
+        values = _le(index.to_numpy())
+        index_header = {"kind": "array", "dtype": values.dtype.str}
+        buffers.append(values)
+
+    header = json.dumps({"rows": len(df), "index": index_header, "columns": columns},
+                        separators=(",", ":")).encode()
+    body = b"".join(np.ascontiguousarray(buffer).tobytes() for buffer in buffers)
+    return MAGIC + struct.pack("<I", len(header)) + header + zlib.compress(body, COMPRESS_LEVEL)
+
+
+def decode_frame(data):
+    if data[:4] != MAGIC:
+        raise ValueError("Not an encoded frame")
+    (header_length,) = struct.unpack_from("<I", data, 4)
+    header = json.loads(data[8:8 + header_length])
+    body = bytearray(zlib.decompress(data[8 + header_length:]))
+    rows = header["rows"]
+    offset = 0
+
+    def take(dtype):
+        nonlocal offset
+        dtype = np.dtype(dtype)
+        values = np.frombuffer(body, dtype=dtype, count=rows, offset=offset)
+        offset += dtype.itemsize * rows
+        return values
+
+    columns = {}
+    for column in header["columns"]:
+        values = take(column["dtype"])
+        if column["kind"] == "array":
+            columns[column["name"]] = values.astype(column["as"], copy=False)
+            continue
+        categorical = pd.Categorical.from_codes(values, categories=column["categories"])
+        columns[column["name"]] = categorical if column["kind"] == "category" else np.asarray(categorical, dtype=object)
+
+    spec = header["index"]
+    if spec["kind"] == "range":
+        index = pd.RangeIndex(spec["start"], spec["start"] + rows * spec["step"], spec["step"])
+    elif spec["kind"] == "datetime":
+        index = pd.DatetimeIndex(take("<i8").astype(f"M8[{spec['unit']}]")).tz_localize("UTC")
+        index = index.tz_convert(spec["tz"]) if spec["tz"] else index.tz_localize(None)
+    else:
+        index = pd.Index(take(spec["dtype"]))
+    for column in header["columns"]:
+        if column["kind"] == "string":
+            # A bare object array would be re-inferred as the default string dtype
+            columns[column["name"]] = pd.Series(columns[column["name"]], index=index, dtype=column["as"])
+    return pd.DataFrame(columns, index=index, columns=[column["name"] for column in header["columns"]])
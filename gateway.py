@@ -0,0 +1,248 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+from collections import OrderedDict
+
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailable(Exception):
+    """The gateway declined to call upstream and had no last-known-good value to serve."""
+
+
+def is_throttled(error):
+    # yfinance raises YFRateLimitError; HTTP clients surface the 429 in the message
+    text = f"{type(error).__name__} {error}"
+    return "RateLimit" in text or "429" in text or "Too Many Requests" in text
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on concurrent calls.
+
+    Each success raises the limit by 1/limit, so it grows by about one per
+    limit's worth of calls; a throttled call halves it. Other failures leave
+    it unchanged.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum or initial * 4
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, outcome):
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == "throttled":
+                self.limit = max(self.minimum, self.limit / 2)
+            elif outcome == "success":
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and stays open for `reset_timeout` seconds.
+
+    Then one probe call is let through: success closes the circuit, failure
+    reopens it with the timeout doubled, up to `max_reset_timeout`.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold=5, reset_timeout=30, max_reset_timeout=300):
+        self.threshold = threshold
+        self.base_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() >= self.opened_at + self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def abandon(self):
+        # An allowed call that never reached upstream; a probe slot is handed back
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Upstream circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_timeout
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+            elif self.state == self.OPEN or self.failures < self.threshold:
+                return
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            logger.warning(f"Upstream circuit open for {self.reset_timeout}s after {self.failures} failures")
+
+
+class MarketDataGateway:
+    """Single choke point for calls to one upstream data service.
+
+    Every call passes a shared token bucket, an adaptive concurrency limit and
+    a circuit breaker, none of which sleep longer than `acquire_timeout`. The
+    last good value per key is kept; it is served whenever the call is shed,
+    the circuit is open or the call fails. A failed key is retried on a
+    background thread after each of `retry_delays` instead of in the caller,
+    and request threads are not sent upstream for it while a retry is
+    pending. A retry's result is handed to the next caller of that key.
+    """
+
+    def __init__(self, name, rate, burst=None, concurrency=4, max_concurrency=16, failure_threshold=5,
+                 reset_timeout=30, retry_delays=(2, 4, 8), acquire_timeout=5, last_good_size=1024,
+                 handoff_seconds=60):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(concurrency, 1, max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.retry_delays = tuple(retry_delays)
+        self.acquire_timeout = acquire_timeout
+        self.last_good_size = last_good_size
+        self.handoff_seconds = handoff_seconds
+        self._last_good = OrderedDict()
+        self._handoff = {}
+        self._pending = set()
+        self._retries = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.served_stale = 0
+        self.shed = 0
+        self.retries = 0
+
+    def call(self, key, fn):
+        """Return fn() for key, or its last good value when upstream cannot be used.
+
+        Raises UpstreamUnavailable, or the call's own error, when there is no
+        last good value to fall back on.
+        """
+        with self._cond:
+            handoff = self._handoff.pop(key, None)
+            pending = key in self._pending
+        if handoff is not None and handoff[1] > time.monotonic():
+            return handoff[0]
+        if pending:
+            return self._fallback(key, UpstreamUnavailable(f"{self.name}: retry pending for {key}"))
+        try:
+            value = self._attempt(fn)
+        except UpstreamUnavailable as e:
+            self.shed += 1
+            return self._fallback(key, e)
+        except Exception as e:
+            self._schedule_retry(key, fn, 0)
+            return self._fallback(key, e)
+        self._remember(key, value)
+        return value
+
+    @property
+    def pending_retries(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _attempt(self, fn):
+        if not self.breaker.allow():
+            raise UpstreamUnavailable(f"{self.name}: circuit open")
+        if not self.bucket.acquire(timeout=self.acquire_timeout):
+            self.breaker.abandon()
+            raise UpstreamUnavailable(f"{self.name}: rate limit")
+        if not self.concurrency.acquire(self.acquire_timeout):
+            self.breaker.abandon()
+            raise UpstreamUnavailable(f"{self.name}: concurrency limit")
+        outcome = "error"
+        try:
+            value = fn()
+            outcome = "success"
+            self.breaker.record_success()
+            return value
+        except Exception as e:
+            if is_throttled(e):
+                outcome = "throttled"
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.concurrency.release(outcome)
+
+    def _fallback(self, key, error):
+        with self._cond:
+            value = self._last_good.get(key)
+        if value is None:
+            raise error
+        self.served_stale += 1
+        logger.warning(f"Serving last good {key} from {self.name}: {error}")
+        return value
+
+    def _remember(self, key, value):
+        with self._cond:
+            self._last_good[key] = value
+            self._last_good.move_to_end(key)
+            while len(self._last_good) > self.last_good_size:
+                self._last_good.popitem(last=False)
+
+    def _schedule_retry(self, key, fn, attempt):
+        with self._cond:
+            if attempt >= len(self.retry_delays):
+                self._pending.discard(key)
+                logger.error(f"Giving up on {key} from {self.name} after {attempt} retries")
+                return
+            self._pending.add(key)
+            heapq.heappush(self._retries, (time.monotonic() + self.retry_delays[attempt], next(self._order),
+                                           key, fn, attempt))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run_retries, name=f"{self.name}-retry", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run_retries(self):
+        while True:
+            with self._cond:
+                while not self._retries or self._retries[0][0] > time.monotonic():
+                    self._cond.wait(self._retries[0][0] - time.monotonic() if self._retries else None)
+                _, _, key, fn, attempt = heapq.heappop(self._retries)
+            self.retries += 1
+            try:
+                value = self._attempt(fn)
+            except Exception as e:
+                logger.warning(f"Retry {attempt + 1} of {key} from {self.name} failed: {e}")
+                self._schedule_retry(key, fn, attempt + 1)
+                continue
+            self._remember(key, value)
+            now = time.monotonic()
+            with self._cond:
+                self._pending.discard(key)
+                # Hand-offs nobody came back for expire here rather than piling up
+                self._handoff = {k: entry for k, entry in self._handoff.items() if entry[1] > now}
+                self._handoff[key] = (value, now + self.handoff_seconds)
@@ -0,0 +1,126 @@
+import os
+import re
+import json
+import threading
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+_PERIOD_RE = re.compile(r"^(\d+)(d|wk|mo|y)$")
+_PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+
+def period_start(period, now):
+    if period == "max":
+        return None
+    if period == "ytd":
+        return now.normalize().replace(month=1, day=1)
+    match = _PERIOD_RE.match(period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+    return now - pd.DateOffset(**{_PERIOD_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def _epoch_seconds(index):
+    # The resolution bars are stored at, whatever the index's time zone
+    utc = index if index.tz is None else index.tz_convert("UTC").tz_localize(None)
+    return utc.as_unit("s").asi8
+
+
+def _same_bars(stored, fresh):
+    return (len(stored) == len(fresh)
+            and np.array_equal(_epoch_seconds(stored.index), _epoch_seconds(fresh.index))
+            and np.array_equal(stored[COLUMNS].to_numpy(dtype=float), fresh[COLUMNS].to_numpy(dtype=float),
+                               equal_nan=True))
+
+
+class HistoryStore:
+    """On-disk OHLCV bars per (symbol, interval), topped up with delta fetches.
+
+    Each series is one .npy file of float64 rows [epoch seconds, O, H, L, C, V]
+    that is replaced atomically on every merge and read back memory-mapped,
+    so other threads and worker processes can serve it without a download.
+    `fetch(symbol, interval, period=None, start=None)` performs the upstream call.
+    """
+
+    def __init__(self, root, fetch):
+        self.root = root
+        self.fetch = fetch
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def get(self, symbol, interval="1d", period="3mo"):
+        with self._lock_for(symbol, interval):
+            stored = self._load(symbol, interval)
+            if stored is not None:
+                start = period_start(period, pd.Timestamp.now(tz=stored.index.tz))
+            if stored is None or (start is not None and stored.index[0] > start + pd.Timedelta(days=7)):
+                # Nothing on disk, or it does not reach back far enough: full download
+                fresh = self.fetch(symbol, interval, period=period)
+                if fresh.empty:
+                    raise ValueError("No data returned")
+                self._save(symbol, interval, fresh)
+                logger.info(f"Stored {len(fresh)} {interval} bars for {symbol}")
+            else:
+                # Refetch from the last stored bar, which may have been incomplete
+                try:
+                    delta = self.fetch(symbol, interval, start=stored.index[-1].strftime("%Y-%m-%d"))
+                except Exception as e:
+                    # The stored bars are the last known good history
+                    logger.warning(f"Serving stored {interval} bars for {symbol}, delta fetch failed: {e}")
+                    delta = stored.iloc[:0]
+                # Most refreshes return only the stored last bar again: leave the files alone
+                if not delta.empty and not _same_bars(stored[stored.index >= delta.index[0]], delta):
+                    merged = pd.concat([stored[stored.index < delta.index[0]], delta[COLUMNS]])
+                    self._save(symbol, interval, merged)
+                    logger.debug(f"Stored {len(merged)} {interval} bars for {symbol}")
+                else:
+                    logger.debug(f"No new {interval} bars for {symbol}")
+            df = self._load(symbol, interval)
+        start = period_start(period, pd.Timestamp.now(tz=df.index.tz))
+        if start is None:
+            return df
+        return df.iloc[df.index.searchsorted(start):]
+
+    def _lock_for(self, symbol, interval):
+        with self._locks_guard:
+            return self._locks.setdefault((symbol, interval), threading.Lock())
+
+    def _paths(self, symbol, interval):
+        base = os.path.join(self.root, f"{symbol.upper()}_{interval}")
+        return base + ".npy", base + ".json"
+
+    def _load(self, symbol, interval):
+        data_path, meta_path = self._paths(symbol, interval)
+        if not os.path.exists(data_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        rows = np.load(data_path, mmap_mode="r")
+        if not len(rows):
+            return None
+        index = pd.to_datetime(np.asarray(rows[:, 0], dtype=np.int64), unit="s", utc=True).as_unit("ns")
+        if meta.get("tz"):
+            index = index.tz_convert(meta["tz"])
+        else:
+            index = index.tz_localize(None)
+        # Wrap the mapped columns without copying; the frame is read-only
+        return pd.DataFrame(rows[:, 1:], index=index, columns=COLUMNS, copy=False)
+
+    def _save(self, symbol, interval, df):
+        os.makedirs(self.root, exist_ok=True)
+        data_path, meta_path = self._paths(symbol, interval)
+        rows = np.empty((len(df), len(COLUMNS) + 1))
+        rows[:, 0] = _epoch_seconds(df.index)
+        rows[:, 1:] = df[COLUMNS].to_numpy(dtype=float)
+        tz = str(df.index.tz) if df.index.tz is not None else None
+        for path, write in ((meta_path, lambda f: json.dump({"tz": tz}, f)),
+                            (data_path, lambda f: np.save(f, rows))):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w" if path.endswith(".json") else "wb") as f:
+                write(f)
+            os.replace(tmp, path)
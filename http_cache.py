@@ -0,0 +1,77 @@
+import gzip
+import hashlib
+import threading
+
+from flask import request, Response
+
+# Bodies smaller than this are not worth the CPU or the Content-Encoding header
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+
+class Representation:
+    """An encoded response body with its strong ETag and, on demand, a gzipped copy."""
+
+    def __init__(self, body):
+        self.body = body if isinstance(body, bytes) else body.encode()
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self._gzipped = None
+
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, GZIP_LEVEL, mtime=0)
+        return self._gzipped
+
+
+class RepresentationCache:
+    """Encode each snapshot view once per version instead of once per request.
+
+    Hashing the encoded body, not the snapshot version, keeps ETags stable
+    across workers that each build their own snapshots.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, version, encode):
+        entry = self._entries.get(name)
+        if entry is None or entry[0] != version:
+            representation = Representation(encode())
+            with self._lock:
+                current = self._entries.get(name)
+                if current is None or current[0] < version:
+                    self._entries[name] = (version, representation)
+            return representation
+        return entry[1]
+
+
+def cache_control(market_open, open_seconds, closed_seconds, private=False):
+    # A user's own data changes with their writes, not the market, so it is
+    # revalidated on every use; the ETag still turns unchanged reads into 304s
+    if private:
+        return "private, no-cache"
+    # Prices move while the market is open, so clients revalidate often; after
+    # the close the data is settled and can be reused for longer
+    max_age = open_seconds if market_open else closed_seconds
+    return f"public, max-age={max_age}, must-revalidate"
+
+
+def respond(representation, cache_control_value, mimetype="application/json"):
+    """Build a 200 or 304 for the current request, gzipping large bodies the client accepts."""
+    compress = (len(representation.body) >= GZIP_MIN_BYTES
+                and request.accept_encodings.quality("gzip") > 0)
+    # Each encoding is a distinct representation, so it gets its own strong ETag
+    etag = f"{representation.etag}-gzip" if compress else representation.etag
+    if request.if_none_match.contains(representation.etag) or request.if_none_match.contains(
+            f"{representation.etag}-gzip"):
+        response = Response(status=304)
+    elif compress:
+        response = Response(representation.gzipped(), mimetype=mimetype)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(representation.body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control_value
+    response.vary.add("Accept-Encoding")
+    return response
@@ -0,0 +1,294 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+NAN = float("nan")
+
+
+class _EMA:
+    # Recursive EMA seeded with the first value, undefined until span values seen
+    # (same as pandas ewm(adjust=False, min_periods=span))
+    def __init__(self, span=None, alpha=None):
+        self.alpha = alpha if alpha is not None else 2 / (span + 1)
+        self.min_periods = span if span is not None else round(1 / alpha)
+        self.value = None
+        self.count = 0
+
+    def update(self, x):
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        self.count += 1
+        return self.current
+
+    @property
+    def current(self):
+        return self.value if self.count >= self.min_periods else NAN
+
+    def clone(self):
+        other = _EMA.__new__(_EMA)
+        other.__dict__.update(self.__dict__)
+        return other
+
+
+class _RollingWindow:
+    # Rolling mean and sample standard deviation over the last `size` values
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, x):
+        if len(self.values) == self.size:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    @property
+    def mean(self):
+        return self.total / self.size if self.full else NAN
+
+    @property
+    def std(self):
+        if not self.full:
+            return NAN
+        variance = (self.total_sq - self.total * self.total / self.size) / (self.size - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def clone(self):
+        other = _RollingWindow(self.size)
+        other.values = deque(self.values, maxlen=self.size)
+        other.total = self.total
+        other.total_sq = self.total_sq
+        return other
+
+
+class _WilderADX:
+    def __init__(self, window=14):
+        self.window = window
+        self.seed = []
+        self.tr = self.plus_dm = self.minus_dm = None
+        self.dx_seed = []
+        self.adx = None
+
+    def update(self, high, low, prev_high, prev_low, prev_close):
+        tr = max(high, prev_close) - min(low, prev_close)
+        up = high - prev_high
+        down = prev_low - low
+        plus_dm = up if up > down and up > 0 else 0.0
+        minus_dm = down if down > up and down > 0 else 0.0
+        n = self.window
+        if self.tr is None:
+            self.seed.append((tr, plus_dm, minus_dm))
+            if len(self.seed) < n:
+                return NAN
+            self.tr, self.plus_dm, self.minus_dm = (sum(col) for col in zip(*self.seed))
+            self.seed = []
+        else:
+            self.tr += tr - self.tr / n
+            self.plus_dm += plus_dm - self.plus_dm / n
+            self.minus_dm += minus_dm - self.minus_dm / n
+        if self.tr == 0:
+            return self.current
+        plus_di = 100 * self.plus_dm / self.tr
+        minus_di = 100 * self.minus_dm / self.tr
+        di_sum = plus_di + minus_di
+        dx = 100 * abs(plus_di - minus_di) / di_sum if di_sum else 0.0
+        if self.adx is None:
+            self.dx_seed.append(dx)
+            if len(self.dx_seed) == n:
+                self.adx = sum(self.dx_seed) / n
+                self.dx_seed = []
+        else:
+            self.adx = (self.adx * (n - 1) + dx) / n
+        return self.current
+
+    @property
+    def current(self):
+        return self.adx if self.adx is not None else NAN
+
+    def clone(self):
+        other = _WilderADX(self.window)
+        other.__dict__.update(self.__dict__)
+        other.seed = list(self.seed)
+        other.dx_seed = list(self.dx_seed)
+        return other
+
+
+class IndicatorState:
+    """Rolling RSI/MACD/PPO/ADX/moving-average state for one symbol, updated one bar at a time."""
+
+    def __init__(self):
+        self.ema_fast = _EMA(span=12)
+        self.ema_slow = _EMA(span=26)
+        self.macd_signal = _EMA(span=9)
+        self.ppo_signal = _EMA(span=9)
+        self.rsi_up = _EMA(alpha=1 / 14)
+        self.rsi_down = _EMA(alpha=1 / 14)
+        self.adx = _WilderADX(14)
+        self.ma = {window: _RollingWindow(window) for window in (25, 50, 150)}
+        self.returns = _RollingWindow(30)
+        self.last_bar = None
+        self.values = {}
+        self.previous = {}
+
+    def update(self, bar):
+        close, high, low = float(bar["Close"]), float(bar["High"]), float(bar["Low"])
+        prev = self.last_bar
+        fast = self.ema_fast.update(close)
+        slow = self.ema_slow.update(close)
+        macd_line = fast - slow
+        ppo_line = macd_line / slow * 100 if slow else NAN
+        macd_hist = ppo_hist = NAN
+        if not math.isnan(macd_line):
+            macd_hist = macd_line - self.macd_signal.update(macd_line)
+            ppo_hist = ppo_line - self.ppo_signal.update(ppo_line)
+        change = close - prev[0] if prev else 0.0
+        up = self.rsi_up.update(max(change, 0.0))
+        down = self.rsi_down.update(max(-change, 0.0))
+        if math.isnan(up):
+            rsi = NAN
+        else:
+            rsi = 100.0 if down == 0 else 100 - 100 / (1 + up / down)
+        adx = self.adx.update(high, low, prev[1], prev[2], prev[0]) if prev else NAN
+        for window in self.ma.values():
+            window.update(close)
+        if prev:
+            self.returns.update(close / prev[0] - 1)
+        self.last_bar = (close, high, low)
+        self.previous = self.values
+        self.values = {
+            "Close": close,
+            "RSI": rsi,
+            "MACD": macd_hist,
+            "PPO": ppo_line,
+            "PPOHist": ppo_hist,
+            "ADX": adx,
+            "MA25": self.ma[25].mean,
+            "MA50": self.ma[50].mean,
+            "MA150": self.ma[150].mean,
+            "Volatility": self.returns.std * 100,
+        }
+        return self.values
+
+    def clone(self):
+        other = IndicatorState.__new__(IndicatorState)
+        for name, value in self.__dict__.items():
+            setattr(other, name, value.clone() if hasattr(value, "clone") else value)
+        other.ma = {window: state.clone() for window, state in self.ma.items()}
+        return other
+
+
+class IndicatorStore:
+    """Per-symbol indicator state that only processes bars it has not seen.
+
+    Completed bars are folded into the stored state once. The newest bar may
+    still be forming, so it is applied to a throwaway copy on every call.
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def update(self, symbol, df):
+        if df.empty:
+            raise ValueError(f"No bars for {symbol}")
+        last_ts = df.index[-1]
+        with self._lock:
+            entry = self._states.get(symbol)
+            # Rebuild when the stored state cannot be continued from this frame
+            if entry is None or entry[0] is None or entry[0] >= last_ts or entry[0] < df.index[0]:
+                entry = (None, IndicatorState())
+            committed_ts, state = entry
+            completed = df.iloc[:-1] if committed_ts is None else df.iloc[:-1][df.index[:-1] > committed_ts]
+            for bar in completed[["Close", "High", "Low"]].to_dict("records"):
+                state.update(bar)
+            if len(completed):
+                committed_ts = completed.index[-1]
+            self._states[symbol] = (committed_ts, state)
+            provisional = state.clone()
+        provisional.update(df.iloc[-1])
+        return provisional.values, provisional.previous
+
+    def reset(self, symbol=None):
+        with self._lock:
+            if symbol is None:
+                self._states.clear()
+            else:
+                self._states.pop(symbol, None)
+
+
+indicator_store = IndicatorStore()
+
+
+def _ema(series, span=None, alpha=None):
+    # Column-wise _EMA: seeded with the first defined value, undefined for the first span values
+    defined = series.dropna()
+    smoothing = {"span": span} if span is not None else {"alpha": alpha}
+    min_periods = span if span is not None else round(1 / alpha)
+    return defined.ewm(adjust=False, min_periods=min_periods, **smoothing).mean().reindex(series.index)
+
+
+def _wilder(values, window):
+    # Column-wise Wilder smoothing as in _WilderADX: the first value is the mean of the
+    # first `window` inputs, then s = s * (window - 1) / window + x / window
+    if len(values) < window:
+        return pd.Series(np.nan, index=values.index)
+    seeded = pd.concat([pd.Series([values.iloc[:window].mean()], index=values.index[window - 1:window]),
+                        values.iloc[window:]])
+    return seeded.ewm(alpha=1 / window, adjust=False).mean().reindex(values.index)
+
+
+def indicator_frame(df, adx_window=14):
+    """IndicatorState values for every bar of an OHLC frame, computed column-wise.
+
+    Matches feeding the bars through IndicatorState one at a time, up to
+    floating-point rounding, in a fraction of the time; the backtester uses
+    it to evaluate signals over years of history.
+    """
+    close = df["Close"].astype(float)
+    high = df["High"].astype(float)
+    low = df["Low"].astype(float)
+
+    fast, slow = _ema(close, span=12), _ema(close, span=26)
+    macd_line = fast - slow
+    ppo_line = (macd_line / slow * 100).where(slow != 0)
+    change = close.diff().fillna(0.0)
+    up, down = _ema(change.clip(lower=0), alpha=1 / 14), _ema((-change).clip(lower=0), alpha=1 / 14)
+    rsi = (100 - 100 / (1 + up / down)).where(down != 0, 100.0).where(up.notna())
+
+    # ADX starts on the second bar; Wilder sums are the smoothed means times the window
+    prev_close, up_move, down_move = close.shift(), high.diff(), -low.diff()
+    tr = (np.maximum(high, prev_close) - np.minimum(low, prev_close)).iloc[1:]
+    plus_dm = up_move.where((up_move > down_move) & (up_move > 0), 0.0).iloc[1:]
+    minus_dm = down_move.where((down_move > up_move) & (down_move > 0), 0.0).iloc[1:]
+    tr_s, plus_s, minus_s = (_wilder(x, adx_window) for x in (tr, plus_dm, minus_dm))
+    # Bars with no true range keep the previous ADX and add no DX
+    moving = tr_s.notna() & (tr_s != 0)
+    plus_di, minus_di = 100 * plus_s[moving] / tr_s[moving], 100 * minus_s[moving] / tr_s[moving]
+    di_sum = plus_di + minus_di
+    dx = (100 * (plus_di - minus_di).abs() / di_sum).where(di_sum != 0, 0.0)
+    adx = _wilder(dx, adx_window).reindex(close.index).ffill()
+
+    returns = close.pct_change()
+    return pd.DataFrame({
+        "Close": close,
+        "RSI": rsi,
+        "MACD": macd_line - _ema(macd_line, span=9),
+        "PPO": ppo_line,
+        "PPOHist": ppo_line - _ema(ppo_line, span=9),
+        "ADX": adx,
+        "MA25": close.rolling(25).mean(),
+        "MA50": close.rolling(50).mean(),
+        "MA150": close.rolling(150).mean(),
+        "Volatility": returns.rolling(30).std() * 100,
+    }, index=df.index)
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import struct
+import threading
+import logging
+from collections import OrderedDict
+
+from cache_backends import make_backend
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    # One in-progress upstream load that concurrent callers wait on
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+# How long one worker may hold a shared load before others stop waiting on
+# it and load for themselves, and how often they look for its result
+SHARED_LOCK_SECONDS = float(os.environ.get("MARKET_CACHE_LOCK_SECONDS", 15))
+SHARED_POLL_SECONDS = 0.05
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry TTL and single-flight loading.
+
+    After share(), misses go through a shared backend (see cache_backends)
+    before loading: values are stored there encoded, with the time they were
+    loaded, so every worker serves one load per key until its TTL runs out.
+    A set-if-absent lock on the backend makes the other workers wait for a
+    load in progress instead of starting their own.
+    """
+
+    def __init__(self, name, ttl, maxsize=256):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.shared = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.shared_hits = 0
+        self.shared_errors = 0
+
+    def share(self, backend, encode, decode):
+        """Put `backend` behind this cache; encode(value) -> bytes and decode(bytes) -> value."""
+        self.shared = backend
+        self._encode = encode
+        self._decode = decode
+
+    def get(self, key):
+        with self._lock:
+            return self._get_fresh(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def keys(self):
+        # Keys with a fresh entry in this process
+        with self._lock:
+            now = time.monotonic()
+            return [key for key, (expires_at, _) in self._entries.items() if expires_at >= now]
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            value = self._get_fresh(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            if self.shared is None:
+                flight.value, ttl = loader(), self.ttl
+            else:
+                flight.value, ttl = self._load_shared(key, loader)
+            if flight.value is not None:
+                with self._lock:
+                    self._store(key, flight.value, ttl)
+            return flight.value
+        except Exception as e:
+            # Failures are handed to waiters but never cached
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _load_shared(self, key, loader):
+        # Returns (value, seconds it stays fresh)
+        shared_key = f"{self.name}:{json.dumps(key)}"
+        lock_key = shared_key + ":lock"
+        locked = False
+        deadline = time.monotonic() + SHARED_LOCK_SECONDS
+        while True:
+            found = self._read_shared(shared_key)
+            if found is not None:
+                self.shared_hits += 1
+                return found
+            try:
+                locked = self.shared.add(lock_key, b"1", SHARED_LOCK_SECONDS)
+            except Exception as e:
+                self._shared_failed("lock", shared_key, e)
+                break
+            if locked or time.monotonic() >= deadline:
+                break
+            time.sleep(SHARED_POLL_SECONDS)
+        try:
+            value = loader()
+            if value is not None:
+                try:
+                    self.shared.set(shared_key, struct.pack("<d", time.time()) + self._encode(value), self.ttl)
+                except Exception as e:
+                    self._shared_failed("write", shared_key, e)
+            return value, self.ttl
+        finally:
+            if locked:
+                try:
+                    self.shared.delete(lock_key)
+                except Exception as e:
+                    self._shared_failed("unlock", shared_key, e)
+
+    def _read_shared(self, shared_key):
+        try:
+            data = self.shared.get(shared_key)
+            if data is None:
+                return None
+            # Fresh for what is left of the TTL of the worker that loaded it
+            (loaded_at,) = struct.unpack_from("<d", data)
+            remaining = loaded_at + self.ttl - time.time()
+            if remaining <= 0:
+                return None
+            return self._decode(data[8:]), remaining
+        except Exception as e:
+            self._shared_failed("read", shared_key, e)
+            return None
+
+    def _shared_failed(self, action, shared_key, error):
+        # The shared tier is an optimization; loads go on without it
+        self.shared_errors += 1
+        logger.warning(f"{self.name} cache shared {action} failed for {shared_key}: {error}")
+
+    def _get_fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value, ttl=None):
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            evicted, _ = self._entries.popitem(last=False)
+            logger.debug(f"{self.name} cache evicted {evicted}")
+
+
+# Process-wide market data caches, sized and timed from the environment
+stock_data_cache = TTLCache(
+    "stock_data",
+    ttl=int(os.environ.get("STOCK_DATA_CACHE_TTL", 300)),
+    maxsize=int(os.environ.get("STOCK_DATA_CACHE_SIZE", 512)),
+)
+options_cache = TTLCache(
+    "options",
+    ttl=int(os.environ.get("OPTIONS_CACHE_TTL", 60)),
+    maxsize=int(os.environ.get("OPTIONS_CACHE_SIZE", 128)),
+)
+# Optional tier shared by every worker: "memory[:maxsize]", "sqlite:<path>" or
+# "redis://host:port/db". Unset keeps each worker's caches to itself.
+shared_backend = make_backend(os.environ.get("MARKET_CACHE_BACKEND", ""))
@@ -0,0 +1,246 @@
+import json
+import time
+import queue
+import asyncio
+import logging
+import threading
+from collections import deque
+
+from snapshots import SnapshotRefresher
+
+logger = logging.getLogger(__name__)
+
+
+def _sse(event, version, data):
+    return f"id: {version}\nevent: {event}\ndata: {json.dumps(data, default=dict, separators=(',', ':'))}\n\n"
+
+
+class LoopEvents:
+    """Bounded event queue filled from any thread and awaited on one event loop.
+
+    put_nowait and get_nowait behave as queue.Queue's, so _publish treats it
+    like a thread subscriber's queue.
+    """
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.maxsize = maxsize
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def put_nowait(self, item):
+        with self._lock:
+            if len(self._items) >= self.maxsize:
+                raise queue.Full
+            self._items.append(item)
+        try:
+            self.loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            pass  # The loop has closed; nobody is waiting
+
+    def get_nowait(self):
+        with self._lock:
+            if not self._items:
+                raise queue.Empty
+            return self._items.popleft()
+
+    async def get(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            self._ready.clear()
+            try:
+                return self.get_nowait()
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise queue.Empty
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+
+class Subscription:
+    def __init__(self, symbols, movers, events):
+        self.symbols = symbols
+        self.movers = movers
+        self.events = events
+        self.resync = False
+
+
+class MarketStream:
+    """Fan one shared quote refresher out to Server-Sent Events subscribers.
+
+    A single SnapshotRefresher polls quotes for the watchlist plus every
+    symbol a client has subscribed to, so upstream load depends on the number
+    of distinct symbols, not on the number of clients. Clients can only add
+    symbols that allowed(symbol) accepts, and a subscription that adds new
+    symbols triggers at most one catch-up refresh at a time. Each new snapshot is
+    diffed against the last one and clients receive only the quotes, movers
+    and market status that changed, filtered to their own symbols. A client
+    that falls behind has its backlog dropped and gets a full snapshot instead.
+    """
+
+    def __init__(self, fetch_quotes, market_status, watchlist, interval=15, max_symbols=200, queue_size=32,
+                 top_movers=10, allowed=None):
+        self.fetch_quotes = fetch_quotes
+        self.allowed = allowed
+        self.market_status = market_status
+        self.watchlist = list(watchlist)
+        self.max_symbols = max_symbols
+        self.queue_size = queue_size
+        self.top_movers = top_movers
+        self.refresher = SnapshotRefresher("market-stream", self._compute, interval)
+        self.refresher.add_listener(self._publish)
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._published = None
+        self._catching_up = False
+        self._catch_up_again = False
+
+    def current(self):
+        return self.refresher.get()
+
+    def subscribe(self, symbols=None, movers=True, loop=None):
+        """Register a subscriber; with an event loop, await its events with next_event_async."""
+        symbols = frozenset(s.upper() for s in symbols or ())
+        if self.allowed is not None:
+            symbols = frozenset(s for s in symbols if s in self.watchlist or self.allowed(s))
+        events = queue.Queue(self.queue_size) if loop is None else LoopEvents(loop, self.queue_size)
+        subscription = Subscription(symbols or frozenset(self.watchlist), movers, events)
+        with self._lock:
+            new_symbols = not subscription.symbols <= self._tracked()
+            self._subscriptions.add(subscription)
+        self.refresher.start()
+        if new_symbols:
+            self._catch_up()
+        return subscription
+
+    def _catch_up(self):
+        # Pick up new symbols now rather than at the next interval, with at most one
+        # refresh in flight; subscriptions arriving meanwhile get one more pass after it
+        with self._lock:
+            if self._catching_up:
+                self._catch_up_again = True
+                return
+            self._catching_up = True
+        threading.Thread(target=self._run_catch_up, name="market-stream-catch-up", daemon=True).start()
+
+    def _run_catch_up(self):
+        while True:
+            try:
+                self.refresher.refresh()
+            except Exception as e:
+                logger.error(f"Market stream catch-up refresh failed: {e}")
+            with self._lock:
+                if not self._catch_up_again:
+                    self._catching_up = False
+                    return
+                self._catch_up_again = False
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            idle = not self._subscriptions
+        if idle:
+            self.refresher.stop()
+
+    def snapshot_event(self, subscription):
+        snapshot = self.current()
+        data = self._view(snapshot.data, subscription, full=True)
+        return _sse("snapshot", snapshot.version, data)
+
+    def next_event(self, subscription, timeout):
+        """The next SSE frame for a subscriber, or None if nothing changed within timeout."""
+        if subscription.resync:
+            subscription.resync = False
+            return self.snapshot_event(subscription)
+        try:
+            return subscription.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def next_event_async(self, subscription, timeout):
+        if subscription.resync:
+            subscription.resync = False
+            return self.snapshot_event(subscription)
+        try:
+            return await subscription.events.get(timeout)
+        except queue.Empty:
+            return None
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscriptions)
+
+    def _tracked(self):
+        symbols = set(self.watchlist)
+        for subscription in self._subscriptions:
+            symbols |= subscription.symbols
+        return symbols
+
+    def _compute(self):
+        with self._lock:
+            tracked = self._tracked()
+        symbols = self.watchlist + sorted(tracked - set(self.watchlist))
+        if len(symbols) > self.max_symbols:
+            logger.warning(f"Market stream tracking {len(symbols)} symbols, capped at {self.max_symbols}")
+            symbols = symbols[:self.max_symbols]
+        quotes = self.fetch_quotes(symbols)
+        movers = sorted((quotes[s] for s in self.watchlist if s in quotes),
+                        key=lambda q: abs(q["change_percent"]), reverse=True)[:self.top_movers]
+        return {"status": self.market_status(), "quotes": quotes, "movers": movers}
+
+    def _view(self, data, subscription, full=False, changed=None, removed=()):
+        quotes = data["quotes"]
+        view = {"status": data["status"]} if full else {}
+        keys = subscription.symbols if full else subscription.symbols & changed
+        view["quotes"] = {s: quotes[s] for s in sorted(keys) if s in quotes}
+        if not full:
+            view["removed"] = [s for s in removed if s in subscription.symbols]
+        if subscription.movers and full:
+            view["movers"] = data["movers"]
+        return view
+
+    def _publish(self, snapshot):
+        with self._lock:
+            previous = self._published
+            if previous is not None and snapshot.version <= previous.version:
+                return
+            self._published = snapshot
+            subscriptions = list(self._subscriptions)
+        if previous is None or not subscriptions:
+            return
+        old, new = previous.data, snapshot.data
+        changed = {s for s, quote in new["quotes"].items() if old["quotes"].get(s) != quote}
+        removed = [s for s in old["quotes"] if s not in new["quotes"]]
+        status_changed = old["status"] != new["status"]
+        movers_changed = list(old["movers"]) != list(new["movers"])
+        if not (changed or removed or status_changed or movers_changed):
+            return
+        # Clients with the same subscription share one encoded frame
+        frames = {}
+        for subscription in subscriptions:
+            key = (subscription.symbols, subscription.movers)
+            if key not in frames:
+                view = self._view(new, subscription, changed=changed, removed=removed)
+                if status_changed:
+                    view["status"] = new["status"]
+                if subscription.movers and movers_changed:
+                    view["movers"] = new["movers"]
+                has_update = view["quotes"] or view["removed"] or "status" in view or "movers" in view
+                frames[key] = _sse("delta", snapshot.version, view) if has_update else None
+            if frames[key] is None:
+                continue
+            try:
+                subscription.events.put_nowait(frames[key])
+            except queue.Full:
+                # Too far behind for deltas to be useful: drop them and resend everything
+                subscription.resync = True
+                while True:
+                    try:
+                        subscription.events.get_nowait()
+                    except queue.Empty:
+                        break
@@ -0,0 +1,242 @@
+import io
+import time
+import pstats
+import bisect
+import cProfile
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Per-request tallies (e.g. chain fetches); None outside a request. parallel.map_symbols
+# runs tasks in copies of the request's context, so pool threads update the same dict
+_request_counts = ContextVar("request_counts", default=None)
+_counts_lock = threading.Lock()
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_ = None
+
+    def __init__(self, name, help_, labelnames=()):
+        self.name = name
+        self.help = help_
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    type_ = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    type_ = "histogram"
+
+    def __init__(self, name, help_, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One slot per bucket plus +Inf, then the running sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self, key, counts):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(counts[-1])}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Gauge or counter read at scrape time: collect() returns {label values: value}."""
+
+    def __init__(self, name, help_, labelnames, collect, type_="gauge"):
+        super().__init__(name, help_, labelnames)
+        self.collect = collect
+        self.type_ = type_
+
+    def render(self):
+        with self._lock:
+            self._values = {tuple(str(v) for v in key): value for key, value in self.collect().items()}
+        return super().render()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_, labelnames=()):
+        return self.register(Counter(name, help_, labelnames))
+
+    def histogram(self, name, help_, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_, labelnames, buckets))
+
+    def callback(self, name, help_, labelnames, collect, type_="gauge"):
+        return self.register(CallbackMetric(name, help_, labelnames, collect, type_))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+request_latency = registry.histogram(
+    "shadowstrike_request_duration_seconds", "Flask request latency by route", ("method", "route", "status"))
+upstream_latency = registry.histogram(
+    "shadowstrike_upstream_duration_seconds", "Latency of calls to external services", ("service", "operation"))
+upstream_errors = registry.counter(
+    "shadowstrike_upstream_errors_total", "Failed calls to external services", ("service", "operation"))
+per_request = registry.histogram(
+    "shadowstrike_work_per_request", "Operations per request, such as chain fetches", ("route", "name"),
+    buckets=COUNT_BUCKETS)
+
+
+@contextmanager
+def upstream(service, operation):
+    """Time one call to an external service and count it if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        upstream_errors.inc(service=service, operation=operation)
+        raise
+    finally:
+        upstream_latency.observe(time.perf_counter() - start, service=service, operation=operation)
+
+
+def begin_request():
+    return _request_counts.set({})
+
+
+def count(name, amount=1):
+    # No-op outside a request, e.g. in the background ranking refresher
+    counts = _request_counts.get()
+    if counts is not None:
+        with _counts_lock:
+            counts[name] = counts.get(name, 0) + amount
+
+
+def end_request(token, route, tracked=()):
+    with _counts_lock:
+        counts = dict(_request_counts.get() or {})
+    _request_counts.reset(token)
+    for name in tracked:
+        per_request.observe(counts.get(name, 0), route=route, name=name)
+
+
+def register_caches(caches):
+    for field, help_ in (("hits", "Cache hits"), ("misses", "Cache misses that loaded from upstream"),
+                         ("coalesced", "Cache lookups that waited on another caller's load"),
+                         ("shared_hits", "Cache misses answered by the shared tier instead of upstream"),
+                         ("shared_errors", "Failed reads and writes of the shared tier")):
+        registry.callback(f"shadowstrike_cache_{field}_total", help_, ("cache",),
+                          lambda field=field: {(c.name,): getattr(c, field) for c in caches}, type_="counter")
+    registry.callback("shadowstrike_cache_hit_ratio", "Share of lookups served without a new load", ("cache",),
+                      lambda: {(c.name,): _hit_ratio(c) for c in caches})
+
+
+def register_gateways(gateways):
+    for field, help_ in (("served_stale", "Calls answered with a last-known-good value"),
+                         ("shed", "Calls declined by the rate limit, concurrency limit or open circuit"),
+                         ("retries", "Background retries of failed upstream calls")):
+        registry.callback(f"shadowstrike_gateway_{field}_total", help_, ("gateway",),
+                          lambda field=field: {(g.name,): getattr(g, field) for g in gateways}, type_="counter")
+    registry.callback("shadowstrike_gateway_circuit_open", "1 while the upstream circuit is open or probing",
+                      ("gateway",), lambda: {(g.name,): int(g.breaker.state != "closed") for g in gateways})
+    registry.callback("shadowstrike_gateway_concurrency_limit", "Current adaptive concurrency limit", ("gateway",),
+                      lambda: {(g.name,): round(g.concurrency.limit, 2) for g in gateways})
+    registry.callback("shadowstrike_gateway_pending_retries", "Keys waiting on a background retry", ("gateway",),
+                      lambda: {(g.name,): g.pending_retries for g in gateways})
+
+
+def _hit_ratio(cache):
+    total = cache.hits + cache.misses + cache.coalesced
+    return round((cache.hits + cache.coalesced + cache.shared_hits) / total, 4) if total else 0.0
+
+
+# Only one cProfile profiler can be active per process on Python 3.12+
+_profile_lock = threading.Lock()
+
+
+def start_profile():
+    """Start a profiler, or return None if another request is being profiled."""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        _profile_lock.release()
+        return None
+    return profiler
+
+
+def profile_report(profiler, limit=40):
+    profiler.disable()
+    _profile_lock.release()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
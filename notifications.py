@@ -0,0 +1,118 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+EMAIL_PATH = "/v3/smtp/email"
+SMS_PATH = "/v1/transactionalSMS/sms"
+# Brevo accepts up to 1000 message versions in one batch send
+MAX_BATCH_SIZE = 1000
+
+
+class HttpTransport:
+    """Posts JSON to the Brevo API (or any stand-in at base_url) over a pooled session."""
+
+    def __init__(self, base_url, api_key, pool_size=10, timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"api-key": api_key or "", "Content-Type": "application/json"})
+
+    def post(self, path, payload):
+        with metrics.upstream("brevo", "sms" if path == SMS_PATH else "email"):
+            return self.session.post(self.base_url + path, json=payload, timeout=self.timeout).status_code
+
+
+class NotificationDispatcher:
+    """Bounded worker pool that sends Brevo email and SMS with rate limiting and retries.
+
+    The transport only needs a post(path, payload) -> status code method, so
+    tests and load runs can swap in a stub.
+    """
+
+    def __init__(self, transport, sender, sms_sender, workers=4, rate=10, batch_size=100,
+                 max_retries=3, backoff=1.0):
+        self.transport = transport
+        self.sender = sender
+        self.sms_sender = sms_sender
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.limiter = TokenBucket(rate)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notifications")
+
+    def send_email(self, to_email, subject, html):
+        payload = {
+            "sender": self.sender,
+            "to": [{"email": to_email}],
+            "subject": subject,
+            "htmlContent": html,
+        }
+        return self._executor.submit(self._deliver, EMAIL_PATH, payload, f"email to {to_email}")
+
+    def send_bulk_email(self, recipients, subject, html):
+        """Send one message to many recipients, batch_size recipients per API call.
+
+        recipients is a list of emails or (email, params) pairs; params fill
+        {{ params.name }} placeholders in html. Each recipient gets a separate
+        message version, so addresses are never exposed to each other.
+        """
+        versions = []
+        for recipient in recipients:
+            email, params = recipient if isinstance(recipient, tuple) else (recipient, None)
+            version = {"to": [{"email": email}]}
+            if params:
+                version["params"] = params
+            versions.append(version)
+        futures = []
+        for start in range(0, len(versions), self.batch_size):
+            batch = versions[start:start + self.batch_size]
+            payload = {
+                "sender": self.sender,
+                "subject": subject,
+                "htmlContent": html,
+                "messageVersions": batch,
+            }
+            futures.append(self._executor.submit(self._deliver, EMAIL_PATH, payload,
+                                                 f"batch email to {len(batch)} recipients"))
+        return futures
+
+    def send_sms(self, to_number, message):
+        payload = {
+            "sender": self.sms_sender,
+            "recipient": to_number,
+            "content": message,
+            "type": "transactional",
+        }
+        return self._executor.submit(self._deliver, SMS_PATH, payload, f"SMS to {to_number}")
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _deliver(self, path, payload, description):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                status = self.transport.post(path, payload)
+            except Exception as e:
+                status, error = None, e
+            else:
+                error = None
+                # Only throttling and server errors are worth another attempt
+                if status < 500 and status != 429:
+                    logger.info(f"Brevo {description} sent: {status}")
+                    return status
+            if attempt < self.max_retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        logger.error(f"Brevo {description} failed: {error or status}")
+        return status
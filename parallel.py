@@ -0,0 +1,128 @@
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+logger = logging.getLogger(__name__)
+
+# One bounded pool shared by all requests so a traffic burst cannot fan out
+# into an unbounded number of upstream connections
+MAX_WORKERS = int(os.environ.get("MARKET_DATA_WORKERS", 8))
+SYMBOL_TIMEOUT = float(os.environ.get("SYMBOL_FETCH_TIMEOUT", 15))
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="market-data")
+# The background universe scan has a pool of its own, so a long scan never queues
+# request-time fetches behind it; it is kept below the gateway's starting concurrency
+SCAN_WORKERS = int(os.environ.get("SCANNER_WORKERS", 2))
+scan_executor = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="scanner")
+# Threads for the blocking calls of requests served on an event loop (see asgi.py)
+ASYNC_WORKERS = int(os.environ.get("ASYNC_UPSTREAM_WORKERS", 32))
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+
+def process_pool(processes):
+    """Shared pool of `processes` worker processes for CPU-bound analytics.
+
+    Workers are spawned rather than forked, since the web process runs
+    background threads, and are started on first use.
+    """
+    with _process_pools_lock:
+        pool = _process_pools.get(processes)
+        if pool is None:
+            pool = _process_pools[processes] = ProcessPoolExecutor(
+                processes, mp_context=multiprocessing.get_context("spawn"))
+        return pool
+
+
+def map_symbols(fn, symbols, timeout=SYMBOL_TIMEOUT, executor=None):
+    """Run fn(symbol) for every symbol concurrently, on the shared pool unless given another.
+
+    Returns (symbol, result, error) tuples in input order. A symbol that raises
+    or misses the deadline gets result None and an error string, so one slow
+    or failing symbol never holds back the others.
+    """
+    executor = executor or _executor
+    # Each task runs in a copy of the caller's context so per-request metrics follow it
+    futures = [(symbol, executor.submit(contextvars.copy_context().run, fn, symbol)) for symbol in symbols]
+    deadline = time.monotonic() + timeout
+    results = []
+    for symbol, future in futures:
+        try:
+            results.append((symbol, future.result(timeout=max(0, deadline - time.monotonic())), None))
+        except FutureTimeout:
+            future.cancel()
+            logger.warning(f"Timed out fetching {symbol} after {timeout}s")
+            results.append((symbol, None, "timeout"))
+        except Exception as e:
+            logger.error(f"Fetch failed for {symbol}: {e}")
+            results.append((symbol, None, str(e)))
+    return results
+
+
+class AsyncOffload:
+    """Runs blocking calls for coroutines on a dedicated thread pool.
+
+    Concurrent awaits of shared() with the same key share one call, so a burst
+    of requests for one symbol reaches upstream once. Calls run in a copy of
+    the caller's context, as map_symbols tasks do. Use from one event loop.
+    """
+
+    def __init__(self, workers, name="async-upstream"):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self):
+        return len(self._inflight)
+
+    async def run(self, fn, *args):
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, contextvars.copy_context().run, fn, *args)
+
+    async def shared(self, key, fn, *args):
+        future = self._inflight.get(key)
+        if future is None:
+            self.calls += 1
+            loop = asyncio.get_running_loop()
+            future = self._inflight[key] = loop.run_in_executor(self.executor, contextvars.copy_context().run,
+                                                                fn, *args)
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A waiter that times out or goes away must not cancel the call for the others
+        return await asyncio.shield(future)
+
+    async def map_symbols(self, fn, symbols, timeout=None):
+        """map_symbols for coroutines: one shared fn(symbol) call per symbol, awaited together.
+
+        The default deadline allows SYMBOL_TIMEOUT per round of the pool.
+        """
+        if not symbols:
+            return []
+        if timeout is None:
+            timeout = SYMBOL_TIMEOUT * math.ceil(len(symbols) / ASYNC_WORKERS)
+        tasks = [asyncio.ensure_future(self.shared((fn, symbol), fn, symbol)) for symbol in symbols]
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        results = []
+        for symbol, task in zip(symbols, tasks):
+            if task in pending:
+                task.cancel()
+                logger.warning(f"Timed out fetching {symbol} after {timeout}s")
+                results.append((symbol, None, "timeout"))
+            elif task.exception() is not None:
+                logger.error(f"Fetch failed for {symbol}: {task.exception()}")
+                results.append((symbol, None, str(task.exception())))
+            else:
+                results.append((symbol, task.result(), None))
+        return results
+
+
+offload = AsyncOffload(ASYNC_WORKERS)
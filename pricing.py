@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+# Greeks units: theta per calendar day, vega and rho per 1 percentage point
+GREEK_FIELDS = ["price", "delta", "gamma", "theta", "vega", "rho", "prob_itm"]
+# Implied volatility search bracket (decimal) and price tolerance
+IV_LOW = 1e-4
+IV_HIGH = 5.0
+IV_TOLERANCE = 1e-6
+
+
+def _pdf(x):
+    return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+
+def price_options(spot, strike, T, rate, iv, is_call):
+    """Black-Scholes price, Greeks and risk-neutral probability ITM for arrays of contracts.
+
+    All inputs broadcast against each other; T is in years and iv is a decimal.
+    Contracts that are expired or have no volatility are priced at their
+    deterministic limit and flagged False in the returned "valid" mask.
+    """
+    S, K, T, r, sigma, is_call = np.broadcast_arrays(
+        np.asarray(spot, dtype=float), np.asarray(strike, dtype=float),
+        np.asarray(T, dtype=float), np.asarray(rate, dtype=float),
+        np.asarray(iv, dtype=float), np.asarray(is_call, dtype=bool))
+    finite = np.isfinite(S) & np.isfinite(K) & np.isfinite(T) & np.isfinite(r) & np.isfinite(sigma)
+    valid = finite & (S > 0) & (K > 0) & (T > 0) & (sigma > 0)
+    sign = np.where(is_call, 1.0, -1.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Substitute harmless values where the closed form does not apply
+        Tv = np.where(valid, T, 1.0)
+        sv = np.where(valid, sigma, 1.0)
+        Sv = np.where(valid, S, 1.0)
+        Kv = np.where(valid, K, 1.0)
+        sqrt_t = np.sqrt(Tv)
+        d1 = (np.log(Sv / Kv) + (r + 0.5 * sv ** 2) * Tv) / (sv * sqrt_t)
+        d2 = d1 - sv * sqrt_t
+        disc = np.exp(-r * Tv)
+        nd1 = ndtr(sign * d1)
+        nd2 = ndtr(sign * d2)
+        pdf_d1 = _pdf(d1)
+
+        price = sign * (Sv * nd1 - Kv * disc * nd2)
+        delta = sign * nd1
+        gamma = pdf_d1 / (Sv * sv * sqrt_t)
+        theta = (-Sv * pdf_d1 * sv / (2 * sqrt_t) - sign * r * Kv * disc * nd2) / 365
+        vega = Sv * pdf_d1 * sqrt_t / 100
+        rho = sign * Kv * Tv * disc * nd2 / 100
+        prob_itm = nd2
+
+        # Deterministic limit: expired (T <= 0) or zero-vol contracts
+        Tc = np.where(T > 0, T, 0.0)
+        forward_intrinsic = sign * (S - K * np.exp(-r * Tc))
+        itm = forward_intrinsic > 0
+        limit_price = np.maximum(forward_intrinsic, 0.0)
+
+    nan = np.where(finite, 0.0, np.nan)
+    return {
+        "price": np.where(valid, price, limit_price + nan),
+        "delta": np.where(valid, delta, np.where(itm, sign, 0.0) + nan),
+        "gamma": np.where(valid, gamma, nan),
+        "theta": np.where(valid, theta, nan),
+        "vega": np.where(valid, vega, nan),
+        "rho": np.where(valid, rho, nan),
+        "prob_itm": np.where(valid, prob_itm, np.where(itm, 1.0, 0.0) + nan),
+        "valid": valid,
+    }
+
+
+def price_chain(chain, spot, rate=0.05):
+    # Price a normalized chain frame (see chains.normalize_chain) in one pass
+    result = price_options(
+        spot,
+        chain["strike"].to_numpy(dtype=float),
+        chain["daysToExpiry"].to_numpy(dtype=float) / 365,
+        rate,
+        chain["impliedVolatility"].to_numpy(dtype=float) / 100,
+        (chain["type"] == "CALL").to_numpy(),
+    )
+    return pd.DataFrame(result, index=chain.index)
+
+
+def solve_chain_iv(chain, spot, rate=0.05):
+    """Replace a normalized chain's vendor IVs with vols solved from bid/ask mids.
+
+    Contracts without a two-sided quote, or whose mid has no Black-Scholes
+    solution, keep the vendor IV. Returns the chain and the solved mask.
+    """
+    bid = chain["bid"].to_numpy(dtype=float)
+    ask = chain["ask"].to_numpy(dtype=float)
+    vendor = chain["impliedVolatility"].to_numpy(dtype=float)
+    mid = np.where((bid > 0) & (ask >= bid), (bid + ask) / 2, np.nan)
+    result = implied_vol(mid, spot, chain["strike"].to_numpy(dtype=float),
+                         chain["daysToExpiry"].to_numpy(dtype=float) / 365, rate,
+                         (chain["type"] == "CALL").to_numpy(), guess=vendor / 100)
+    solved = result["converged"]
+    iv = np.where(solved, np.round(result["iv"] * 100, 1), vendor)
+    return chain.assign(impliedVolatility=iv), solved
+
+
+def _price_vega(S, K, T, r, sigma, sign):
+    # Undiscounted-vega Black-Scholes price for the solver; inputs are already valid
+    sqrt_t = np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * sqrt_t)
+    d2 = d1 - sigma * sqrt_t
+    price = sign * (S * ndtr(sign * d1) - K * np.exp(-r * T) * ndtr(sign * d2))
+    return price, S * _pdf(d1) * sqrt_t
+
+
+def implied_vol(price, spot, strike, T, rate, is_call, guess=None, max_iter=50):
+    """Invert Black-Scholes for arrays of option prices.
+
+    Safeguarded Newton: each contract keeps a bracket [IV_LOW, IV_HIGH] that
+    narrows every iteration, and any Newton step that leaves the bracket or
+    stalls on a tiny vega is replaced by bisection. Prices outside the
+    no-arbitrage bounds, or whose vol lies outside [IV_LOW, IV_HIGH], have no
+    solution. Returns "iv" (decimal, NaN where unsolved), "converged" and
+    "iterations".
+    """
+    P, S, K, T, r, is_call = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(spot, dtype=float), np.asarray(strike, dtype=float),
+        np.asarray(T, dtype=float), np.asarray(rate, dtype=float), np.asarray(is_call, dtype=bool))
+    shape = P.shape
+    P, S, K, T, r, is_call = (a.ravel() for a in (P, S, K, T, r, is_call))
+    n = P.size
+    sign = np.where(is_call, 1.0, -1.0)
+    iv = np.full(n, np.nan)
+    converged = np.zeros(n, dtype=bool)
+    iterations = np.zeros(n, dtype=np.int64)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        finite = np.isfinite(P) & np.isfinite(S) & np.isfinite(K) & np.isfinite(T) & np.isfinite(r)
+        ok = finite & (P > 0) & (S > 0) & (K > 0) & (T > 0)
+        disc_k = K * np.exp(-r * np.where(ok, T, 0.0))
+        lower = np.maximum(sign * (S - disc_k), 0.0)
+        upper = np.where(is_call, S, disc_k)
+        ok &= (P > lower) & (P < upper)
+
+        active = np.flatnonzero(ok)
+        P, S, K, T, r, sign = P[active], S[active], K[active], T[active], r[active], sign[active]
+        lo = np.full(len(active), IV_LOW)
+        hi = np.full(len(active), IV_HIGH)
+        if guess is None:
+            # Brenner-Subrahmanyam at-the-money approximation
+            sigma = np.sqrt(2 * np.pi / T) * P / S
+        else:
+            sigma = np.broadcast_to(np.asarray(guess, dtype=float), shape).ravel()[active]
+        sigma = np.where(np.isfinite(sigma) & (sigma > IV_LOW) & (sigma < IV_HIGH), sigma, 0.5 * (IV_LOW + IV_HIGH))
+
+        for i in range(1, max_iter + 1):
+            if not len(active):
+                break
+            model, vega = _price_vega(S, K, T, r, sigma, sign)
+            diff = model - P
+            # Price rises with volatility, so the sign of the error narrows the bracket
+            hi = np.where(diff > 0, sigma, hi)
+            lo = np.where(diff < 0, sigma, lo)
+            collapsed = hi - lo < IV_TOLERANCE
+            # A bracket that collapsed onto IV_LOW or IV_HIGH never crossed the
+            # price: the vol lies outside the search range, so it stays unsolved
+            solved = (np.abs(diff) < IV_TOLERANCE) | (collapsed & (lo > IV_LOW) & (hi < IV_HIGH))
+            done = solved | collapsed
+            iv[active[solved]] = np.where(np.abs(diff) < IV_TOLERANCE, sigma, 0.5 * (lo + hi))[solved]
+            converged[active[solved]] = True
+            iterations[active[done]] = i
+
+            keep = ~done
+            active, P, S, K, T, r, sign = active[keep], P[keep], S[keep], K[keep], T[keep], r[keep], sign[keep]
+            lo, hi, sigma, diff, vega = lo[keep], hi[keep], sigma[keep], diff[keep], vega[keep]
+            step = sigma - diff / vega
+            sigma = np.where(np.isfinite(step) & (step > lo) & (step < hi), step, 0.5 * (lo + hi))
+        iterations[active] = max_iter
+
+    return {"iv": iv.reshape(shape), "converged": converged.reshape(shape), "iterations": iterations.reshape(shape)}
@@ -0,0 +1,181 @@
+import os
+import zlib
+import json
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from pricing import price_options
+
+logger = logging.getLogger(__name__)
+
+# Expirations pulled per symbol; later ones are rarely traded
+MAX_EXPIRATIONS = 5
+CHAIN_FIELDS = ["strike", "lastPrice", "bid", "ask", "volume", "openInterest", "impliedVolatility"]
+
+
+class YFinanceProvider:
+    """Live market data from yfinance.
+
+    Every provider has a name and exposes history(symbol, interval,
+    period=None, start=None), returning an OHLCV frame, and
+    option_chain(symbol), returning the raw (expiration, calls, puts) tuples
+    that chains.normalize_chain expects.
+    """
+
+    name = "yfinance"
+
+    @staticmethod
+    def _ticker(symbol):
+        # Imported on first use, so the offline providers run without yfinance installed
+        import yfinance as yf
+        return yf.Ticker(symbol)
+
+    def history(self, symbol, interval, period=None, start=None):
+        stock = self._ticker(symbol)
+        if start is not None:
+            return stock.history(start=start, interval=interval)
+        return stock.history(period=period, interval=interval)
+
+    def option_chain(self, symbol):
+        stock = self._ticker(symbol)
+        raw_chains = []
+        for exp in stock.options[:MAX_EXPIRATIONS]:
+            opt = stock.option_chain(exp)
+            raw_chains.append((exp, opt.calls, opt.puts))
+        return raw_chains
+
+
+class FixtureProvider:
+    """Replays market data recorded by record_fixtures, with no network access.
+
+    Recorded bars and expirations are shifted forward so the last bar lands on
+    today, which keeps period windows and days-to-expiry stable however old
+    the recording is. "SPY~3" replays SPY under another name, so a handful of
+    recordings can stand in for hundreds of symbols.
+    """
+
+    name = "fixtures"
+
+    def __init__(self, root):
+        self.root = root
+        self._fixtures = {}
+
+    def symbols(self):
+        return sorted(name[:-len(".pkl.gz")] for name in os.listdir(self.root) if name.endswith(".pkl.gz"))
+
+    def history(self, symbol, interval, period=None, start=None):
+        fixture = self._load(symbol)
+        df = fixture["history"][interval]
+        df = df.set_axis(df.index + fixture["shift"])
+        if start is not None:
+            return df[df.index >= pd.Timestamp(start, tz=df.index.tz)]
+        return df
+
+    def option_chain(self, symbol):
+        fixture = self._load(symbol)
+        return [((datetime.strptime(exp, "%Y-%m-%d") + fixture["shift"]).strftime("%Y-%m-%d"), calls, puts)
+                for exp, calls, puts in fixture["chain"]]
+
+    def _load(self, symbol):
+        base = symbol.split("~")[0].upper()
+        if base not in self._fixtures:
+            fixture = pd.read_pickle(os.path.join(self.root, f"{base}.pkl.gz"))
+            fixture["shift"] = pd.Timedelta(days=(pd.Timestamp.now().normalize() - fixture["recorded_at"]).days)
+            self._fixtures[base] = fixture
+        return self._fixtures[base]
+
+
+class SyntheticProvider:
+    """Deterministic generated market data for load tests at any symbol count.
+
+    Each symbol gets a seeded random-walk price history and a Black-Scholes
+    priced chain around its last close.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, seed=0, bars=300, strikes=41, expirations=MAX_EXPIRATIONS):
+        self.seed = seed
+        self.bars = bars
+        self.strikes = strikes
+        self.expirations = expirations
+
+    def history(self, symbol, interval, period=None, start=None):
+        rng = self._rng(symbol)
+        index = pd.bdate_range(end=pd.Timestamp.now(tz="America/New_York").normalize(), periods=self.bars)
+        close = rng.uniform(20, 500) * np.exp(np.cumsum(rng.normal(0, 0.012, self.bars)))
+        spread = np.abs(rng.normal(0, 0.006, self.bars))
+        df = pd.DataFrame({
+            "Open": close * (1 + rng.normal(0, 0.003, self.bars)),
+            "High": close * (1 + spread),
+            "Low": close * (1 - spread),
+            "Close": close,
+            "Volume": rng.integers(100_000, 5_000_000, self.bars).astype(float),
+        }, index=index)
+        if start is not None:
+            return df[df.index >= pd.Timestamp(start, tz=index.tz)]
+        return df
+
+    def option_chain(self, symbol):
+        spot = float(self.history(symbol, "1d")["Close"].iloc[-1])
+        rng = self._rng(symbol, "chain")
+        strikes = np.round(spot * np.linspace(0.8, 1.2, self.strikes), 2)
+        today = pd.Timestamp.now().normalize()
+        raw_chains = []
+        for weeks in range(1, self.expirations + 1):
+            exp = today + pd.Timedelta(weeks=weeks)
+            iv = 0.2 + 0.1 * np.abs(np.log(strikes / spot)) + rng.normal(0, 0.01, len(strikes))
+            frames = []
+            for is_call in (True, False):
+                price = np.round(price_options(spot, strikes, weeks * 7 / 365, 0.05, iv, is_call)["price"], 2)
+                frames.append(pd.DataFrame({
+                    "strike": strikes,
+                    "lastPrice": price,
+                    "bid": np.maximum(price - 0.05, 0),
+                    "ask": price + 0.05,
+                    "volume": rng.integers(0, 5000, len(strikes)),
+                    "openInterest": rng.integers(0, 20000, len(strikes)),
+                    "impliedVolatility": iv,
+                }))
+            raw_chains.append((exp.strftime("%Y-%m-%d"), frames[0], frames[1]))
+        return raw_chains
+
+    def _rng(self, symbol, stream=""):
+        return np.random.default_rng([self.seed, zlib.crc32(f"{symbol}{stream}".encode())])
+
+
+def record_fixtures(provider, symbols, root, intervals=("1d",), period="2y"):
+    """Save each symbol's history and option chain from provider for FixtureProvider."""
+    os.makedirs(root, exist_ok=True)
+    recorded = []
+    for symbol in symbols:
+        try:
+            fixture = {
+                "recorded_at": pd.Timestamp.now().normalize(),
+                "history": {interval: provider.history(symbol, interval, period=period) for interval in intervals},
+                "chain": [(exp, calls[CHAIN_FIELDS], puts[CHAIN_FIELDS])
+                          for exp, calls, puts in provider.option_chain(symbol)],
+            }
+        except Exception as e:
+            logger.error(f"Could not record {symbol}: {e}")
+            continue
+        pd.to_pickle(fixture, os.path.join(root, f"{symbol.upper()}.pkl.gz"))
+        recorded.append(symbol.upper())
+    with open(os.path.join(root, "manifest.json"), "w") as f:
+        json.dump({"recorded_at": datetime.now().isoformat(), "symbols": recorded, "intervals": list(intervals)}, f, indent=2)
+    return recorded
+
+
+def make_provider(spec):
+    """Build a provider from "yfinance", "synthetic[:seed]" or "fixtures:<dir>"."""
+    kind, _, arg = spec.partition(":")
+    if kind == "yfinance":
+        return YFinanceProvider()
+    if kind == "synthetic":
+        return SyntheticProvider(seed=int(arg or 0))
+    if kind == "fixtures":
+        return FixtureProvider(arg)
+    raise ValueError(f"Unknown market data provider: {spec}")
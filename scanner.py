@@ -0,0 +1,71 @@
+import os
+import heapq
+import itertools
+
+from parallel import process_pool
+
+SHARD_SIZE = int(os.environ.get("SCANNER_SHARD_SIZE", 25))
+
+
+class TopK:
+    """The k largest items of a stream by key, in O(k) memory.
+
+    Ties keep the item pushed first, as a stable descending sort would.
+    """
+
+    def __init__(self, k, key):
+        self.k = k
+        self.key = key
+        self._heap = []
+        self._order = itertools.count()
+
+    def push(self, item):
+        entry = (self.key(item), -next(self._order), item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def extend(self, items):
+        for item in items:
+            self.push(item)
+
+    def items(self):
+        return [item for _, _, item in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+def load_universe(spec):
+    """Symbols from a comma-separated spec, in order and without duplicates.
+
+    "@path" entries read one symbol per line from a file; blank lines and
+    lines starting with "#" are skipped.
+    """
+    symbols = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if entry.startswith("@"):
+            with open(entry[1:]) as f:
+                symbols.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith("#"))
+        elif entry:
+            symbols.append(entry)
+    return list(dict.fromkeys(symbol.upper() for symbol in symbols))
+
+
+def shards(symbols, size=SHARD_SIZE):
+    return [symbols[i:i + size] for i in range(0, len(symbols), size)]
+
+
+def scan_universe(symbols, scan_shard, processes=0, shard_size=SHARD_SIZE):
+    """Run scan_shard over the universe in shards and yield each shard's result.
+
+    With processes > 1 shards run on the shared process pool, so scan_shard
+    must be a module-level function; otherwise they run here one by one.
+    Either way results arrive shard by shard, so callers can fold them into
+    bounded rankings without holding the whole universe.
+    """
+    parts = shards(symbols, shard_size)
+    if processes > 1:
+        yield from process_pool(processes).map(scan_shard, parts)
+    else:
+        for part in parts:
+            yield scan_shard(part)
@@ -0,0 +1,174 @@
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from parallel import process_pool
+from spreads import candidate_verticals
+
+# Merton jump term: `intensity` jumps per year with normally distributed log
+# sizes of mean `mean` and standard deviation `vol`
+Jumps = namedtuple("Jumps", ["intensity", "mean", "vol"])
+
+PERCENTILES = (5, 25, 50, 75, 95)
+# Upper bound on paths x instruments simulated at once; each cell is a float64
+MAX_CELLS = int(os.environ.get("SCENARIO_MAX_CELLS", 2_000_000))
+STAT_COLUMNS = ["expected_value", "std", "probability_profit", "var", "cvar"] + [f"p{p}" for p in PERCENTILES]
+
+def terminal_shocks(paths, days, seed, jumps=None):
+    """Standard normal shocks and summed log jumps to one expiration.
+
+    Draws depend only on (seed, days), so every instrument expiring that day
+    sees the same paths however the work is chunked or distributed.
+    """
+    rng = np.random.default_rng([seed, days])
+    z = rng.standard_normal(paths)
+    if jumps is None or jumps.intensity <= 0:
+        return z, None
+    counts = rng.poisson(jumps.intensity * days / 365, paths)
+    return z, counts * jumps.mean + np.sqrt(counts) * jumps.vol * rng.standard_normal(paths)
+
+
+def _sorted_percentiles(rows, levels):
+    # Percentiles of each already sorted row, with numpy's default linear interpolation
+    position = np.asarray(levels, dtype=float) / 100 * (rows.shape[1] - 1)
+    low = np.floor(position).astype(np.intp)
+    high = np.minimum(low + 1, rows.shape[1] - 1)
+    frac = position - low
+    return rows[:, low] * (1 - frac) + rows[:, high] * frac
+
+
+def _simulate_group(spot, drift, paths, seed, jumps, confidence, days, long_strike, short_strike, is_call, cost, iv):
+    # P&L statistics for instruments that share one expiration, MAX_CELLS at a time
+    z, log_jumps = terminal_shocks(paths, days, seed, jumps)
+    if log_jumps is None:
+        # Terminal prices rise with z and every payoff is monotone in the terminal
+        # price, so with sorted shocks each P&L row comes out already ordered
+        z = np.sort(z)
+    T = days / 365
+    compensator = jumps.intensity * (np.exp(jumps.mean + 0.5 * jumps.vol ** 2) - 1) if log_jumps is not None else 0.0
+    levels = list(PERCENTILES) + [(1 - confidence) * 100]
+    tail_paths = max(1, int(np.ceil((1 - confidence) * paths)))
+    n = len(cost)
+    stats = {col: np.empty(n) for col in STAT_COLUMNS}
+    chunk = max(1, MAX_CELLS // paths)
+    for start in range(0, n, chunk):
+        part = slice(start, start + chunk)
+        sigma = iv[part, None]
+        sign = np.where(is_call[part], 1.0, -1.0)[:, None]
+        # One row of paths per instrument, built in place to keep a single matrix alive
+        terminal = sigma * np.sqrt(T) * z
+        terminal += (drift - compensator - 0.5 * sigma ** 2) * T
+        if log_jumps is not None:
+            terminal += log_jumps
+        np.exp(terminal, out=terminal)
+        terminal *= spot
+        pnl = terminal - long_strike[part, None]
+        pnl *= sign
+        np.maximum(pnl, 0.0, out=pnl)
+        spread = ~np.isnan(short_strike[part])
+        if spread.any():
+            # Short legs are valued in the terminal matrix itself when every row is a spread
+            rows = slice(None) if spread.all() else spread
+            short = terminal[rows]
+            short -= short_strike[part][rows, None]
+            short *= sign[rows]
+            np.maximum(short, 0.0, out=short)
+            pnl[rows] -= short
+            del short
+        del terminal
+        pnl -= cost[part, None]
+        pnl *= 100
+
+        puts = ~is_call[part]
+        if log_jumps is None:
+            pnl[puts] = pnl[puts, ::-1]
+        else:
+            pnl.sort(axis=1)
+        quantiles = _sorted_percentiles(pnl, levels)
+        mean = pnl.mean(axis=1)
+        stats["expected_value"][part] = mean
+        stats["std"][part] = np.sqrt(np.maximum(np.einsum("ij,ij->i", pnl, pnl) / paths - mean ** 2, 0.0))
+        stats["probability_profit"][part] = np.count_nonzero(pnl > 0, axis=1) / paths
+        stats["var"][part] = np.maximum(-quantiles[:, -1], 0.0)
+        # Expected shortfall: the mean loss over the worst (1 - confidence) of paths
+        stats["cvar"][part] = np.maximum(-pnl[:, :tail_paths].mean(axis=1), 0.0)
+        for i, p in enumerate(PERCENTILES):
+            stats[f"p{p}"][part] = quantiles[:, i]
+    return stats
+
+
+def simulate(spot, days, long_strike, is_call, cost, iv, short_strike=None, rate=0.05, drift=None, paths=10_000,
+             seed=0, jumps=None, confidence=0.95, processes=0):
+    """Monte Carlo P&L at expiry for long options and debit verticals.
+
+    Each instrument is bought for `cost` (per share) and held to expiry while
+    the underlying follows GBM at its implied volatility (a decimal), plus the
+    optional Jumps term. Instruments with a short_strike are verticals whose
+    short leg shares the long leg's type and expiration. The drift defaults to
+    the risk-free rate. Returns a frame of STAT_COLUMNS per instrument, in
+    dollars per contract; var and cvar are losses at `confidence`. With
+    processes > 1 expirations are split across a process pool; results are
+    identical either way for the same seed.
+    """
+    days = np.maximum(np.asarray(days, dtype=np.int64), 0)
+    columns = np.broadcast_arrays(
+        np.asarray(long_strike, dtype=float),
+        np.full(len(days), np.nan) if short_strike is None else np.asarray(short_strike, dtype=float),
+        np.asarray(is_call, dtype=bool), np.asarray(cost, dtype=float), np.asarray(iv, dtype=float))
+    drift = rate if drift is None else drift
+    groups = []
+    for day in np.unique(days):
+        rows = np.flatnonzero(days == day)
+        groups.extend((int(day), part) for part in np.array_split(rows, max(processes, 1)) if len(part))
+    args = [(spot, drift, paths, seed, jumps, confidence, day) + tuple(col[rows] for col in columns)
+            for day, rows in groups]
+    if processes > 1:
+        results = list(process_pool(processes).map(_simulate_group, *zip(*args)))
+    else:
+        results = [_simulate_group(*a) for a in args]
+
+    stats = {col: np.full(len(days), np.nan) for col in STAT_COLUMNS}
+    for (_, rows), result in zip(groups, results):
+        for col in STAT_COLUMNS:
+            stats[col][rows] = result[col]
+    return pd.DataFrame(stats)
+
+
+def simulate_chain(index, spot, rate=0.05, include_spreads=True, **options):
+    """Scenario statistics for every priced contract and debit vertical on a chain.
+
+    Contracts are bought at their last price and verticals at their debit,
+    as in spreads.search_verticals; verticals follow the long leg's implied
+    volatility. Returns (contracts, spreads) frames; see simulate for options.
+    """
+    chain = index.chain
+    contracts = chain[(chain["price"] > 0) & (chain["daysToExpiry"] >= 0)]
+    contract_stats = simulate(
+        spot, contracts["daysToExpiry"].to_numpy(), contracts["strike"].to_numpy(dtype=float),
+        (contracts["type"] == "CALL").to_numpy(), contracts["price"].to_numpy(dtype=float),
+        contracts["impliedVolatility"].to_numpy(dtype=float) / 100, rate=rate, **options)
+    contracts = pd.concat([contracts[["type", "strike", "expiration", "price", "impliedVolatility"]]
+                           .reset_index(drop=True), contract_stats], axis=1)
+    if not include_spreads:
+        return contracts, None
+
+    buy, sell, is_call, debit, width = candidate_verticals(index)
+    strike = chain["strike"].to_numpy(dtype=float)
+    days = chain["daysToExpiry"].to_numpy()[buy]
+    live = days >= 0
+    buy, sell, is_call, debit, width, days = buy[live], sell[live], is_call[live], debit[live], width[live], days[live]
+    spread_stats = simulate(spot, days, strike[buy], is_call, debit,
+                            chain["impliedVolatility"].to_numpy(dtype=float)[buy] / 100,
+                            short_strike=strike[sell], rate=rate, **options)
+    spreads = pd.concat([pd.DataFrame({
+        "type": np.where(is_call, "bull_call", "bear_put"),
+        "expiration": chain["expiration"].astype(str).to_numpy()[buy],
+        "buy_strike": strike[buy],
+        "sell_strike": strike[sell],
+        "debit": debit,
+        "max_profit": (width - debit) * 100,
+        "max_loss": debit * 100,
+    }), spread_stats], axis=1)
+    return contracts, spreads
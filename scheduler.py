@@ -0,0 +1,119 @@
+import os
+import fcntl
+import logging
+import threading
+from datetime import datetime, timedelta, time
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+
+
+def market_status(now=None):
+    """Regular-session status for US equities; exchange holidays are not modelled."""
+    now = (now or datetime.now(MARKET_TIMEZONE)).astimezone(MARKET_TIMEZONE)
+    is_open = now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+    next_open = datetime.combine(now.date(), MARKET_OPEN, tzinfo=MARKET_TIMEZONE)
+    if now.time() >= MARKET_OPEN:
+        next_open += timedelta(days=1)
+    while next_open.weekday() >= 5:
+        next_open += timedelta(days=1)
+    return {
+        "is_open": is_open,
+        "status": "OPEN" if is_open else "CLOSED",
+        "next_open": next_open.strftime("%Y-%m-%d %H:%M %Z"),
+    }
+
+
+class _Job:
+    def __init__(self, name, func, hour, minute, weekdays_only):
+        self.name = name
+        self.func = func
+        self.hour = hour
+        self.minute = minute
+        self.weekdays_only = weekdays_only
+        self.last_run = None
+        # Failed attempts on failed_on, and when the next one is due
+        self.failed_on = None
+        self.failures = 0
+        self.retry_at = None
+
+
+class DailyScheduler:
+    """Run registered jobs once per day after a wall-clock time in the market timezone.
+
+    Jobs receive the run date. A file lock makes sure only one process on the
+    host runs a job at a time; jobs are still expected to be idempotent, since
+    another process may already have run them today. A failed job is retried
+    after retry_seconds, doubling after each failure, at most max_attempts
+    times a day.
+    """
+
+    def __init__(self, timezone="America/New_York", poll_seconds=60, lock_path=None,
+                 retry_seconds=300, max_attempts=5):
+        self.timezone = ZoneInfo(timezone)
+        self.poll_seconds = poll_seconds
+        self.retry_seconds = retry_seconds
+        self.max_attempts = max_attempts
+        self.lock_path = lock_path or os.path.join("/tmp", "shadowstrike-scheduler.lock")
+        self._jobs = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, func, hour, minute=0, weekdays_only=True):
+        self._jobs.append(_Job(name, func, hour, minute, weekdays_only))
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="daily-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_pending(self, now=None):
+        now = now or datetime.now(self.timezone)
+        for job in self._jobs:
+            today = now.date()
+            if job.last_run == today or (job.weekdays_only and now.weekday() >= 5):
+                continue
+            if (now.hour, now.minute) < (job.hour, job.minute):
+                continue
+            if job.failed_on == today and (job.failures >= self.max_attempts or now < job.retry_at):
+                continue
+            self.run_job(job, today, now)
+
+    def run_job(self, job, run_date, now=None):
+        with open(self.lock_path, "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info(f"Job {job.name} is running in another process")
+                return
+            try:
+                job.func(run_date)
+                job.last_run = run_date
+                logger.info(f"Job {job.name} completed for {run_date}")
+            except Exception as e:
+                if job.failed_on != run_date:
+                    job.failed_on, job.failures = run_date, 0
+                job.failures += 1
+                if job.failures >= self.max_attempts:
+                    logger.error(f"Job {job.name} failed for {run_date}, giving up after "
+                                 f"{job.failures} attempts: {e}")
+                else:
+                    delay = self.retry_seconds * 2 ** (job.failures - 1)
+                    job.retry_at = (now or datetime.now(self.timezone)) + timedelta(seconds=delay)
+                    logger.error(f"Job {job.name} failed for {run_date}, retrying in {delay}s: {e}")
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_pending()
+            self._stop.wait(self.poll_seconds)
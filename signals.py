@@ -0,0 +1,33 @@
+# Signal rules from analyze_stock, shared with the backtester. Each rule takes
+# the latest and previous indicator values, either dicts of floats for one bar
+# or aligned frames for a whole history, and returns a bool or a bool mask.
+# Comparisons with NaN are False in both forms, so undefined indicators never fire.
+
+BULLISH = 1
+BEARISH = -1
+
+# Recommendations, checked in order; a bar with neither is "Hold"
+RECOMMENDATIONS = {
+    "Call (Bullish)": (BULLISH, lambda cur, prev: (cur["RSI"] < 30) & (cur["MACD"] > 0) & (cur["ADX"] > 25)),
+    "Put (Bearish)": (BEARISH, lambda cur, prev: (cur["RSI"] > 70) & (cur["MACD"] < 0) & (cur["ADX"] > 25)),
+}
+CROSSOVERS = {
+    "MACD Crossover (Bullish)": (BULLISH, lambda cur, prev: (cur["MACD"] > 0) & (prev["MACD"] <= 0)),
+    "MACD Crossover (Bearish)": (BEARISH, lambda cur, prev: (cur["MACD"] < 0) & (prev["MACD"] >= 0)),
+    "PPO Crossover (Bullish)": (BULLISH, lambda cur, prev: (cur["PPO"] > 0) & (prev["PPO"] <= 0)),
+    "PPO Crossover (Bearish)": (BEARISH, lambda cur, prev: (cur["PPO"] < 0) & (prev["PPO"] >= 0)),
+    "Price/MA50 Crossover (Bullish)": (BULLISH, lambda cur, prev: (cur["Close"] > cur["MA50"])
+                                       & (prev["Close"] <= prev["MA50"])),
+}
+RULES = {**RECOMMENDATIONS, **CROSSOVERS}
+
+
+def recommendation(latest, previous):
+    for name, (_, rule) in RECOMMENDATIONS.items():
+        if rule(latest, previous):
+            return name
+    return "Hold"
+
+
+def crossover_signals(latest, previous):
+    return [name for name, (_, rule) in CROSSOVERS.items() if rule(latest, previous)]
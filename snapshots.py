@@ -0,0 +1,95 @@
+import time
+import threading
+import logging
+from collections import namedtuple
+from datetime import datetime
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+Snapshot = namedtuple("Snapshot", ["version", "generated_at", "data"])
+
+
+def _freeze(data):
+    return MappingProxyType({key: tuple(value) if isinstance(value, list) else value
+                             for key, value in data.items()})
+
+
+class SnapshotRefresher:
+    """Recompute a result on a background thread and publish it as an immutable snapshot.
+
+    Readers only ever see a complete snapshot; a refresh that fails keeps the
+    previous one in place. Listeners added with add_listener are called with
+    each new snapshot after it is published.
+    """
+
+    def __init__(self, name, compute, interval):
+        self.name = name
+        self.compute = compute
+        self.interval = interval
+        self._snapshot = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def start(self):
+        if self.running:
+            return
+        # A fresh event per thread, so a stopped thread that has not exited yet
+        # cannot be revived or confused with its replacement
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name=f"{self.name}-refresher",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def get(self):
+        snapshot = self._snapshot
+        # Without a running refresher, serve on demand and recompute once stale
+        if snapshot is None or (not self.running and self._age(snapshot) > self.interval):
+            snapshot = self.refresh()
+        return snapshot
+
+    def refresh(self):
+        version = self._snapshot.version if self._snapshot else 0
+        with self._refresh_lock:
+            # Another thread may have published while we waited on the lock
+            if self._snapshot is not None and self._snapshot.version != version:
+                return self._snapshot
+            started = time.monotonic()
+            try:
+                data = self.compute()
+            except Exception as e:
+                logger.error(f"{self.name} refresh failed: {e}")
+                if self._snapshot is None:
+                    raise
+                return self._snapshot
+            snapshot = self._snapshot = Snapshot(version + 1, datetime.utcnow(), _freeze(data))
+            logger.info(f"{self.name} snapshot v{version + 1} built in {time.monotonic() - started:.2f}s")
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"{self.name} listener failed: {e}")
+        return snapshot
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def _age(self, snapshot):
+        return (datetime.utcnow() - snapshot.generated_at).total_seconds()
+
+    def _run(self, stop):
+        while not stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                pass
+            stop.wait(self.interval)
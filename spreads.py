@@ -0,0 +1,103 @@
+import numpy as np
+
+from pricing import price_options
+
+SPREAD_TYPES = ("bull_call", "bear_put")
+# Smallest profit per share worth listing; below it the spread is rounding noise
+MIN_SPREAD_PROFIT = 0.01
+
+
+def _score(name, pop, max_profit, max_loss):
+    if name == "probability":
+        return pop
+    if name == "reward_risk":
+        return max_profit / max_loss
+    if name == "expected_value":
+        return pop * max_profit - (1 - pop) * max_loss
+    raise ValueError(f"Unknown spread score: {name}")
+
+
+def vertical_pairs(index, spread_type, expiration):
+    # Every (long, short) leg pair at one expiration, as chain row positions
+    type_ = "CALL" if spread_type == "bull_call" else "PUT"
+    strikes, positions = index.strikes(type_, expiration)
+    prices = index.chain["price"].to_numpy(dtype=float)[positions]
+    keep = prices > 0
+    strikes, positions = strikes[keep], positions[keep]
+    low, high = np.triu_indices(len(strikes), k=1)
+    if spread_type == "bull_call":
+        return positions[low], positions[high]
+    return positions[high], positions[low]
+
+
+def candidate_verticals(index, spread_types=SPREAD_TYPES):
+    """Every viable debit vertical on a chain as parallel arrays.
+
+    Returns (buy, sell, is_call, debit, width): leg row positions, whether the
+    spread is a bull call, and its debit and strike width. Spreads whose debit
+    is not positive, or leaves less than MIN_SPREAD_PROFIT below the width,
+    are dropped.
+    """
+    buys, sells, kinds = [], [], []
+    for spread_type in spread_types:
+        for expiration in index.expirations:
+            buy, sell = vertical_pairs(index, spread_type, expiration)
+            buys.append(buy)
+            sells.append(sell)
+            kinds.append(np.full(len(buy), spread_type == "bull_call"))
+    if not buys:
+        empty = np.empty(0)
+        return empty.astype(np.intp), empty.astype(np.intp), empty.astype(bool), empty, empty
+    buy, sell, is_call = np.concatenate(buys), np.concatenate(sells), np.concatenate(kinds)
+    strike = index.chain["strike"].to_numpy(dtype=float)
+    price = index.chain["price"].to_numpy(dtype=float)
+    debit = price[buy] - price[sell]
+    width = np.abs(strike[sell] - strike[buy])
+    viable = (debit > 0) & (width - debit >= MIN_SPREAD_PROFIT)
+    return buy[viable], sell[viable], is_call[viable], debit[viable], width[viable]
+
+
+def search_verticals(index, spot, rate=0.05, top_k=5, score="expected_value", spread_types=SPREAD_TYPES):
+    """Rank every same-expiration bull call and bear put vertical on a chain.
+
+    Debit spreads are priced from last trade prices; probability of profit is
+    the risk-neutral probability of finishing beyond the breakeven, using the
+    long leg's implied volatility; spreads whose long leg has expired or has
+    no IV are skipped. Returns up to top_k spreads, best first.
+    """
+    chain = index.chain
+    buy, sell, is_call, debit, width = candidate_verticals(index, spread_types)
+    if not len(buy):
+        return []
+
+    strike = chain["strike"].to_numpy(dtype=float)
+    breakeven = np.where(is_call, strike[buy] + debit, strike[buy] - debit)
+    priced = price_options(spot, breakeven, chain["daysToExpiry"].to_numpy(dtype=float)[buy] / 365, rate,
+                           chain["impliedVolatility"].to_numpy(dtype=float)[buy] / 100, is_call)
+    # Expired or zero-IV legs only have a degenerate 0 or 100% probability
+    valid = priced["valid"]
+    if not valid.any():
+        return []
+    buy, sell, is_call, debit, width = buy[valid], sell[valid], is_call[valid], debit[valid], width[valid]
+    breakeven, pop = breakeven[valid], priced["prob_itm"][valid]
+    max_profit = (width - debit) * 100
+    max_loss = debit * 100
+    scores = _score(score, pop, max_profit, max_loss)
+
+    top = np.argsort(-scores, kind="stable")[:top_k] if len(scores) <= top_k else \
+        np.argpartition(-scores, top_k - 1)[:top_k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    expirations = chain["expiration"].astype(str).to_numpy()
+    return [{
+        "type": "bull_call" if is_call[i] else "bear_put",
+        "expiration": expirations[buy[i]],
+        "buy_strike": float(strike[buy[i]]),
+        "sell_strike": float(strike[sell[i]]),
+        "debit": round(float(debit[i]), 2),
+        "max_profit": round(float(max_profit[i]), 2),
+        "max_loss": round(float(max_loss[i]), 2),
+        "breakeven": round(float(breakeven[i]), 2),
+        "probability": round(float(pop[i]) * 100, 1),
+        "expected_value": round(float(pop[i] * max_profit[i] - (1 - pop[i]) * max_loss[i]), 2),
+        "score": round(float(scores[i]), 4),
+    } for i in top]
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from pricing import price_options
+
+POSITION_COLUMNS = ["id", "symbol", "option_type", "strike_price", "expiration", "entry_price", "quantity", "broker_fee"]
+
+
+def positions_frame(trades):
+    return pd.DataFrame([{col: getattr(trade, col) for col in POSITION_COLUMNS} for trade in trades],
+                        columns=POSITION_COLUMNS)
+
+
+def value_positions(positions, indexes, spots=None, rate=0.05):
+    """Mark option positions to market against one chain snapshot per symbol.
+
+    positions has POSITION_COLUMNS; indexes (chains.ChainIndex) and spots are
+    keyed by symbol. Returns the positions with current_price, pnl and
+    probability (% ITM, when a spot is known) added. Positions whose contract
+    is not on the chain are carried at their entry price.
+    """
+    n = len(positions)
+    quotes = {col: np.full(n, np.nan) for col in ("price", "daysToExpiry", "impliedVolatility")}
+    for symbol, rows in positions.groupby("symbol").indices.items():
+        index = indexes.get(symbol)
+        if index is None or index.chain.empty:
+            continue
+        group = positions.iloc[rows]
+        found = index.lookup(group["option_type"].to_numpy(), group["strike_price"].to_numpy(dtype=float),
+                             group["expiration"].to_numpy())
+        hit = found >= 0
+        for col, values in quotes.items():
+            values[rows[hit]] = index.chain[col].to_numpy(dtype=float)[found[hit]]
+    entry = positions["entry_price"].to_numpy(dtype=float)
+    current = np.where(np.isnan(quotes["price"]), entry, quotes["price"])
+    pnl = ((current - entry) * positions["quantity"].to_numpy(dtype=float) * 100
+           - positions["broker_fee"].fillna(0).to_numpy(dtype=float))
+    probability = np.full(n, np.nan)
+    if spots and n:
+        greeks = price_options(positions["symbol"].map(spots).to_numpy(dtype=float),
+                               positions["strike_price"].to_numpy(dtype=float),
+                               quotes["daysToExpiry"] / 365, rate, quotes["impliedVolatility"] / 100,
+                               (positions["option_type"] == "CALL").to_numpy())
+        probability = np.round(greeks["prob_itm"] * 100, 1)
+    return positions.assign(current_price=np.round(current, 2), pnl=np.round(pnl, 2), probability=probability)